@@ -1,27 +1,76 @@
-import jwt
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-from . import models
+from sqlalchemy.orm import Session
+import models, schemas
+from database import config, run_sync
+from hashing import HashPool, PoolSaturated
+
+auth_config = config.get('auth', {})
 
 # JWT Configuration
-SECRET_KEY = "your-secret-key"
+SECRET_KEY = auth_config.get('secret_key', "your-secret-key")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = auth_config.get('access_token_expire_minutes', 30)
 
 # OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing pool, bcrypt cost factor and queue bound from the "hashing" section of config.json
+hashing_config = auth_config.get('hashing', {})
+hash_pool = HashPool(
+    rounds=hashing_config.get('rounds', 12),
+    workers=hashing_config.get('workers'),
+    max_pending=hashing_config.get('max_pending'),
+)
+HASHING_RETRY_AFTER = hashing_config.get('retry_after_seconds', 1)
+
+def _busy():
+    return HTTPException(status_code=503, detail="Too many logins in progress, try again shortly",
+                         headers={"Retry-After": str(HASHING_RETRY_AFTER)})
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    try:
+        return hash_pool.hash(password)
+    except PoolSaturated:
+        raise _busy()
 
+# Returns (valid, new_hash), see hashing._verify_and_update
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return hash_pool.verify_and_update(plain_password, hashed_password)
+    except PoolSaturated:
+        raise _busy()
 
+async def verify_password_async(plain_password, hashed_password):
+    try:
+        return await hash_pool.verify_and_update_async(plain_password, hashed_password)
+    except PoolSaturated:
+        raise _busy()
+
+# Verified instead of a stored hash when the username is unknown or has another role, so that
+# such a login costs as much as a wrong password and its timing does not tell which usernames
+# exist. Made with the configured cost factor on the first such login of each worker.
+_dummy_hash = None
+
+async def _verify_dummy(password: str):
+    global _dummy_hash
+    try:
+        if _dummy_hash is None:
+            _dummy_hash = await hash_pool.hash_async(secrets.token_hex(16))
+        await hash_pool.verify_and_update_async(password, _dummy_hash)
+    except PoolSaturated:
+        raise _busy()
+
+# python-jose is imported on first use, it is not needed to start the app
 def create_access_token(data: dict, expires_delta: timedelta = None):
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -31,24 +80,141 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Tokens carry everything the role and ownership checks need, so identity costs no database
+# lookup: "pid" is the id of the user's customer, restaurant or courier row (see _get_user)
+def create_user_token(user: models.User):
+    return create_access_token({"sub": str(user.id), "role": user.role, "active": bool(user.active),
+                                "pid": user.profile_id})
+
 def decode_access_token(token: str):
+    from jose import jwt, JWTError, ExpiredSignatureError
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
-    except jwt.ExpiredSignatureError:
+    except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
+    except JWTError:
         raise HTTPException(status_code=401, detail="Token is invalid")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# Bounded LRU of tokens whose signature was already verified, keyed by the signature segment.
+# The full token is compared on a hit, and entries stop being served at the token's expiry.
+class TokenCache:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # signature -> (token, claims, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        signature = token.rpartition(".")[2]
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._entries[signature]
+                return None
+            self._entries.move_to_end(signature)
+        return entry[1] if hmac.compare_digest(entry[0], token) else None
+
+    def put(self, token: str, claims: dict):
+        with self._lock:
+            self._entries[token.rpartition(".")[2]] = (token, claims, claims["exp"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+token_cache = TokenCache(auth_config.get('token_cache_size', 10000))
+
+def verify_token(token: str):
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = decode_access_token(token)
+        token_cache.put(token, claims)
+    return claims
+
+# Row of each role that requests act on, linked to the user by user_id
+PROFILE_MODELS = {
+    "customer": models.Customer,
+    "restaurant_owner": models.RestaurantOwner,
+    "delivery_personnel": models.DeliveryPersonnel,
+}
+
+# Detached from the session, so the attributes stay readable after later commits. The id of
+# the row of the user's role is read in the same statement and set as user.profile_id.
+def _get_user(db: Session, username: str):
+    profiles = {role: model.id for role, model in PROFILE_MODELS.items()}
+    query = db.query(models.User, *profiles.values())
+    for model in PROFILE_MODELS.values():
+        query = query.outerjoin(model, model.user_id == models.User.id)
+    row = query.filter(models.User.username == username).first()
+    if row is None:
+        return None
+    user = row[0]
+    db.expunge(user)
+    user.profile_id = dict(zip(profiles, row[1:])).get(user.role)
+    return user
+
+def _store_password_hash(db: Session, user_id: int, password_hash: str):
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.password: password_hash}, synchronize_session=False
+    )
+    db.commit()
+
+# Unified login: checks the credentials, and the role when a role-specific endpoint is used.
+# Takes a session from get_async_db. Hashes with outdated parameters and legacy plaintext
+# passwords are replaced on a successful login.
+async def authenticate_user(db, username: str, password: str, role: str = None):
+    user = await run_sync(db, _get_user, username)
+    if not user or (role and user.role != role):
+        await _verify_dummy(password)
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    valid, new_hash = await verify_password_async(password, user.password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    if not user.active:
+        raise HTTPException(status_code=403, detail="User is deactivated")
+    if new_hash:
+        await run_sync(db, _store_password_hash, user.id, new_hash)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=401, detail="Could not validate credentials"
     )
-    try:
-        payload = decode_access_token(token)
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        return models.User(id=user_id)
-    except JWTError:
-        raise credentials_exception
\ No newline at end of file
+    claims = verify_token(token)
+    if claims.get("sub") is None or claims.get("role") is None:
+        raise credentials_exception
+    if not claims.get("active", False):
+        raise HTTPException(status_code=403, detail="User is deactivated")
+    return schemas.TokenData(id=int(claims["sub"]), role=claims["role"], active=claims["active"],
+                             profile_id=claims.get("pid"))
+
+# Dependency factory for role checks; admins pass every check
+def require_role(*roles: str):
+    async def check_role(user: schemas.TokenData = Depends(get_current_user)):
+        if user.role != "admin" and user.role not in roles:
+            raise HTTPException(status_code=403, detail="Not allowed for this role")
+        return user
+    return check_role
+
+require_customer = require_role("customer")
+require_restaurant_owner = require_role("restaurant_owner")
+require_delivery_personnel = require_role("delivery_personnel")
+require_admin = require_role("admin")
+
+# Requests act on the caller's own customer, restaurant or courier row; admins act on any
+def not_owner():
+    return HTTPException(status_code=403, detail="Not allowed for this account")
+
+# Id of the row the caller may act on, None for admins (any row)
+def owned_id(user: schemas.TokenData):
+    if user.role == "admin":
+        return None
+    if user.profile_id is None:
+        raise not_owner()
+    return user.profile_id
+
+def check_owner(user: schemas.TokenData, profile_id: int):
+    owner = owned_id(user)
+    if owner is not None and owner != profile_id:
+        raise not_owner()
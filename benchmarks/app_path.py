@@ -0,0 +1,16 @@
+# The router package lives in the directory routers.py/, which the `from routers import ...`
+# in main.py cannot find under that name. Processes that import main get a temporary
+# directory holding a `routers` link to it on their PYTHONPATH.
+import os
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Environment for a child process that imports main: os.environ with the link directory and
+# the repository root put first on PYTHONPATH
+def app_env(environ=None):
+    environ = dict(os.environ if environ is None else environ)
+    links = tempfile.mkdtemp(prefix="routers_link_")
+    os.symlink(os.path.join(ROOT, "routers.py"), os.path.join(links, "routers"), target_is_directory=True)
+    environ["PYTHONPATH"] = os.pathsep.join(filter(None, [links, ROOT, environ.get("PYTHONPATH")]))
+    return environ
@@ -0,0 +1,62 @@
+# Courier assignment latency of the in-memory spatial index used by dispatch.py.
+#
+#   python benchmarks/dispatch_benchmark.py --couriers 10000 50000 --orders 1000
+#
+# Couriers and restaurants are spread uniformly over a ~35 km square city; each run
+# indexes the couriers and matches one batch of orders with geo.match_nearest.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import GridIndex, match_nearest
+
+CITY = (12.80, 77.45, 0.32)  # south-west corner and size in degrees
+
+def random_point(rng):
+    south, west, size = CITY
+    return south + rng.random() * size, west + rng.random() * size
+
+def run(couriers: int, orders: int, restaurants: int, cell_size: float, seed: int):
+    rng = random.Random(seed)
+    restaurant_points = [random_point(rng) for _ in range(restaurants)]
+    index = GridIndex(cell_size)
+    started = time.perf_counter()
+    for courier_id in range(couriers):
+        index.upsert(courier_id, *random_point(rng))
+    build_seconds = time.perf_counter() - started
+
+    pickups = [(order_id, *rng.choice(restaurant_points)) for order_id in range(orders)]
+    started = time.perf_counter()
+    matches = match_nearest(index, pickups)
+    match_seconds = time.perf_counter() - started
+    return {
+        "couriers": couriers,
+        "orders": orders,
+        "matched": len(matches),
+        "build_ms": build_seconds * 1000,
+        "batch_ms": match_seconds * 1000,
+        "per_assignment_us": match_seconds / max(len(matches), 1) * 1e6,
+        "avg_km": sum(km for _, _, km in matches) / max(len(matches), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Courier assignment latency of the dispatch spatial index")
+    parser.add_argument("--couriers", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--restaurants", type=int, default=2000)
+    parser.add_argument("--cell-size", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'couriers':>9} {'orders':>7} {'matched':>8} {'build ms':>9} {'batch ms':>9} {'us/assign':>10} {'avg km':>7}")
+    for couriers in args.couriers:
+        result = run(couriers, args.orders, args.restaurants, args.cell_size, args.seed)
+        print(f"{result['couriers']:>9} {result['orders']:>7} {result['matched']:>8} {result['build_ms']:>9.1f} "
+              f"{result['batch_ms']:>9.1f} {result['per_assignment_us']:>10.1f} {result['avg_km']:>7.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# HTTP load driver for a running API seeded by benchmarks/seed.py. Start the app with
+# benchmarks/serve.py, from a directory whose config.json points at the seeded database:
+#
+#   python benchmarks/serve.py --workers 4 --port 8000 &
+#   python benchmarks/load_test.py --concurrency 16 --duration 10 --output results/today.json
+#   python benchmarks/load_test.py --routers customers --baseline results/today.json
+#
+# Each scenario runs on its own for --duration seconds with --concurrency threads, each on
+# a keep-alive connection, and reports req/s and p50/p95/p99 latency. Only reads run unless
+# --writes is given; writes change the seeded data, so reseed before comparing runs.
+# With --baseline the run is compared scenario by scenario and the exit status is 1 when
+# p95 or throughput regressed by more than --threshold percent.
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+class Scenario:
+    def __init__(self, name: str, role: str, build, write: bool = False, expect=(200,)):
+        self.name = name
+        self.router = name.split(".")[0]
+        self.role = role  # whose token is sent, None for public endpoints
+        self.build = build  # (rng, manifest) -> (method, path, query params, json body)
+        self.write = write
+        self.expect = expect
+
+def _restaurant(rng, m):
+    return rng.randint(1, m["restaurants"])
+
+def _order(rng, m):
+    return rng.randint(1, m["orders"])
+
+# Customer, restaurant and courier id of the ROLE_USERS accounts: requests acting on a row
+# must act on the caller's own, random orders mostly belong to someone else (403)
+OWN_ID = 1
+
+SCENARIOS = [
+    Scenario("customers.browse_restaurants", None, lambda rng, m: ("GET", "/customers/restaurants", {}, None)),
+    Scenario("customers.browse_open_restaurants", None,
+             lambda rng, m: ("GET", "/customers/restaurants", {"open_now": "true"}, None)),
+    Scenario("customers.view_menu", None,
+             lambda rng, m: ("GET", f"/customers/restaurants/{_restaurant(rng, m)}/menu", {}, None)),
+    Scenario("customers.search_menu", None,
+             lambda rng, m: ("GET", "/customers/search-menu", {"query": rng.choice(m["search_words"])[:rng.randint(3, 6)]}, None)),
+    Scenario("customers.track_order", "customer", lambda rng, m: ("GET", f"/customers/order/{_order(rng, m)}", {}, None),
+             expect=(200, 403)),
+    Scenario("customers.view_order_history", "customer",
+             lambda rng, m: ("GET", "/customers/order-history", {"customer_id": OWN_ID}, None),
+             expect=(200, 404)),
+    Scenario("customers.place_order", "customer", lambda rng, m: ("POST", "/customers/order", {}, {
+        "customer_id": OWN_ID,
+        "restaurant_owner_id": (restaurant := _restaurant(rng, m)),
+        "items": [{"menu_id": (restaurant - 1) * m["menu_items_per_restaurant"] + rng.randint(1, m["menu_items_per_restaurant"]),
+                   "quantity": rng.randint(1, 3)}],
+    }), write=True, expect=(200, 400)),
+    Scenario("restaurant_owners.view_orders", "restaurant_owner", lambda rng, m: (
+        "GET", "/restaurant_owners/orders", {"restaurant_owner_id": OWN_ID, "status": "pending"}, None),
+        expect=(200, 404)),
+    Scenario("restaurant_owners.update_order_status", "restaurant_owner", lambda rng, m: (
+        "PUT", f"/restaurant_owners/orders/{_order(rng, m)}", {"status": rng.choice(["preparing", "ready for delivery"])}, None),
+        write=True, expect=(200, 403, 404)),
+    Scenario("delivery_personnel.view_available_deliveries", "delivery_personnel", lambda rng, m: (
+        "GET", "/delivery_personnel/deliveries", {"delivery_personnel_id": OWN_ID}, None),
+        expect=(200, 404)),
+    Scenario("delivery_personnel.set_delivery_availability", "delivery_personnel", lambda rng, m: (
+        "PUT", f"/delivery_personnel/availability/{OWN_ID}", {},
+        {"available": True, "latitude": 12.8 + rng.random() * 0.32, "longitude": 77.45 + rng.random() * 0.32}),
+        write=True, expect=(200, 404)),
+    Scenario("delivery_personnel.report_location", "delivery_personnel", lambda rng, m: (
+        "POST", f"/delivery_personnel/location/{OWN_ID}", {},
+        {"latitude": 12.8 + rng.random() * 0.32, "longitude": 77.45 + rng.random() * 0.32}),
+        write=True, expect=(202,)),
+    Scenario("delivery_personnel.get_location", "delivery_personnel", lambda rng, m: (
+        "GET", f"/delivery_personnel/location/{rng.randint(1, m['couriers'])}", {}, None), expect=(200, 404)),
+    Scenario("admins.get_orders", "admin", lambda rng, m: ("GET", "/admins/orders", {"status": "pending"}, None)),
+    Scenario("admins.popular_restaurants", "admin", lambda rng, m: ("GET", "/admins/reports/popular_restaurants", {}, None)),
+    Scenario("admins.order_trends", "admin", lambda rng, m: ("GET", "/admins/reports/order_trends", {}, None)),
+    Scenario("admins.monitor_activity", "admin", lambda rng, m: ("GET", "/admins/activity", {}, None)),
+    Scenario("admins.dispatch_orders", "admin", lambda rng, m: ("POST", "/admins/dispatch", {}, None), write=True),
+]
+
+# Seeded account used for each role's token
+ROLE_USERS = {"admin": "admin", "customer": "customer1", "restaurant_owner": "restaurant1",
+              "delivery_personnel": "courier1"}
+
+def login(base: urllib.parse.SplitResult, username: str, password: str):
+    connection = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+    body = urllib.parse.urlencode({"username": username, "password": password})
+    connection.request("POST", "/login", body, {"Content-Type": "application/x-www-form-urlencoded"})
+    response = connection.getresponse()
+    payload = response.read()
+    connection.close()
+    if response.status != 200:
+        raise SystemExit(f"login as {username} failed: {response.status} {payload[:200]!r}")
+    return json.loads(payload)["access_token"]
+
+def percentile(ordered, fraction: float):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def run_scenario(base, scenario: Scenario, manifest: dict, token: str, concurrency: int, duration: float, seed: int):
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    statuses = [{} for _ in range(concurrency)]
+    start = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        connection = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=60)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            method, path, params, body = scenario.build(rng, manifest)
+            if params:
+                path += "?" + urllib.parse.urlencode(params)
+            request_headers = dict(headers)
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                request_headers["Content-Type"] = "application/json"
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, payload, request_headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=60)
+                status = "connection error"
+            latencies[index].append(time.perf_counter() - started)
+            statuses[index][status] = statuses[index].get(status, 0) + 1
+            if status not in scenario.expect:
+                errors[index] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latency for per_thread in latencies for latency in per_thread)
+    status_counts = {}
+    for per_thread in statuses:
+        for status, count in per_thread.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+    return {
+        "requests": len(ordered),
+        "errors": sum(errors),
+        "statuses": status_counts,
+        "rps": len(ordered) / elapsed,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float):
+    regressed = []
+    print(f"\ncompared with {baseline.get('started', 'baseline')}")
+    print(f"{'scenario':<46} {'req/s':>16} {'p95 ms':>18}")
+    for name, result in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        rps_change = (result["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        p95_change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        worse = rps_change < -threshold or p95_change > threshold
+        if worse:
+            regressed.append(name)
+        print(f"{name:<46} {result['rps']:>8.1f} {rps_change:>+6.1f}% {result['p95_ms']:>9.2f} {p95_change:>+6.1f}%"
+              + ("  REGRESSED" if worse else ""))
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive every router of a running API and report latency percentiles")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--manifest", default="seed_manifest.json", help="written by benchmarks/seed.py")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--routers", nargs="+", help="only these routers (customers, restaurant_owners, ...)")
+    parser.add_argument("--scenarios", nargs="+", help="only these scenarios, e.g. customers.view_menu")
+    parser.add_argument("--writes", action="store_true", help="also run the scenarios that modify data")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=10, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.manifest) as manifest_file:
+        manifest = json.load(manifest_file)
+    base = urllib.parse.urlsplit(args.base_url)
+    scenarios = [scenario for scenario in SCENARIOS
+                 if (args.writes or not scenario.write)
+                 and (not args.routers or scenario.router in args.routers)
+                 and (not args.scenarios or scenario.name in args.scenarios)]
+    if not scenarios:
+        raise SystemExit("no scenario selected")
+    tokens = {role: login(base, ROLE_USERS[role], manifest["password"])
+              for role in sorted({scenario.role for scenario in scenarios if scenario.role})}
+
+    results = {"started": datetime.now().isoformat(timespec="seconds"), "base_url": args.base_url,
+               "concurrency": args.concurrency, "duration": args.duration, "scenarios": {}}
+    print(f"{'scenario':<46} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for scenario in scenarios:
+        result = run_scenario(base, scenario, manifest, tokens.get(scenario.role), args.concurrency, args.duration, args.seed)
+        results["scenarios"][scenario.name] = result
+        print(f"{scenario.name:<46} {result['requests']:>9} {result['errors']:>7} {result['rps']:>8.1f} "
+              f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}", flush=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressed = compare(results, json.load(baseline_file), args.threshold)
+        if regressed:
+            print(f"\n{len(regressed)} scenario(s) regressed by more than {args.threshold:g}%")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Sustained courier location ingest: pings recorded in locations.LocationBuffer and flushed
+# in batches, against one UPDATE and commit per ping.
+#
+#   python benchmarks/location_ingest_benchmark.py --couriers 5000 --threads 8 --duration 5
+#
+# Writer threads send pings for random couriers for --duration seconds, as fast as they can
+# or at --rate pings per second in total, while a flusher writes the buffer every
+# --flush-seconds as the app's background job does. At the end the database must hold the
+# latest ping of every courier. No config.json is needed (the app modules fall back to
+# their defaults without one); the data lives in a temporary SQLite file, pass --url to use
+# another database.
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.orm import sessionmaker
+import models
+from locations import LocationBuffer
+
+CITY = (12.80, 77.45, 0.32)  # south-west corner and size in degrees, as in dispatch_benchmark
+
+def setup(url: str, couriers: int):
+    engine = create_engine(url, pool_size=20)
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(models.DeliveryPersonnel.__table__.delete())
+        connection.execute(insert(models.DeliveryPersonnel.__table__),
+                           [{"id": i, "name": f"Courier {i}", "is_available": True} for i in range(1, couriers + 1)])
+    return engine, sessionmaker(bind=engine)
+
+def ping(rng, couriers: int):
+    south, west, size = CITY
+    return rng.randint(1, couriers), south + rng.random() * size, west + rng.random() * size
+
+# rate: pings per second over all threads, 0 for as fast as possible
+def run_writers(threads: int, duration: float, send, rate: float = 0):
+    counts = [0] * threads
+    deadline = time.perf_counter() + duration
+    interval = threads / rate if rate else 0
+
+    def writer(index):
+        rng = random.Random(index)
+        sent = 0
+        next_ping = time.perf_counter()
+        while time.perf_counter() < deadline:
+            send(rng)
+            sent += 1
+            if interval:
+                next_ping += interval
+                delay = next_ping - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        counts[index] = sent
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts), time.perf_counter() - started
+
+def buffered(Session, args):
+    buffer = LocationBuffer(max_couriers=args.couriers, batch_size=args.batch_size)
+    flushes = []  # (rows, seconds)
+    stop = threading.Event()
+
+    def flusher():
+        while not stop.wait(args.flush_seconds):
+            db = Session()
+            started = time.perf_counter()
+            rows = buffer.flush(db)
+            flushes.append((rows, time.perf_counter() - started))
+            db.close()
+
+    flush_thread = threading.Thread(target=flusher)
+    flush_thread.start()
+    pings, elapsed = run_writers(args.threads, args.duration, lambda rng: buffer.record(*ping(rng, args.couriers)),
+                                 args.rate)
+    stop.set()
+    flush_thread.join()
+    db = Session()
+    buffer.flush(db)  # what the app does on shutdown
+    stored = {courier_id: (latitude, longitude) for courier_id, latitude, longitude in
+              db.query(models.DeliveryPersonnel.id, models.DeliveryPersonnel.latitude, models.DeliveryPersonnel.longitude)}
+    db.close()
+    latest = buffer.positions()
+    mismatched = sum(1 for courier_id, (latitude, longitude, _) in latest.items()
+                     if stored.get(courier_id) != (latitude, longitude))
+    flush_ms = [seconds * 1000 for _, seconds in flushes] or [0.0]
+    print(f"buffered: {pings / elapsed:>10.0f} pings/s, {len(flushes)} flushes of "
+          f"{statistics.mean([rows for rows, _ in flushes] or [0]):.0f} rows "
+          f"(median {statistics.median(flush_ms):.1f} ms, max {max(flush_ms):.1f} ms), "
+          f"{len(latest)} couriers, {mismatched} stored positions differ from the latest ping")
+    return mismatched
+
+def direct(Session, args):
+    table = models.DeliveryPersonnel.__table__
+    local = threading.local()
+
+    def send(rng):
+        if not hasattr(local, "db"):
+            local.db = Session()
+        courier_id, latitude, longitude = ping(rng, args.couriers)
+        local.db.execute(update(table).where(table.c.id == courier_id).values(latitude=latitude, longitude=longitude))
+        local.db.commit()
+
+    pings, elapsed = run_writers(args.threads, args.duration, send, args.rate)
+    print(f"direct:   {pings / elapsed:>10.0f} pings/s, one UPDATE and commit per ping")
+
+def main():
+    parser = argparse.ArgumentParser(description="Courier location ingest rate, buffered against direct writes")
+    parser.add_argument("--url", help="database URL, a temporary SQLite file by default")
+    parser.add_argument("--couriers", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--rate", type=float, default=0, help="pings per second to sustain, 0 for as fast as possible")
+    parser.add_argument("--flush-seconds", type=float, default=1.0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--skip-direct", action="store_true")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/locations.db"
+    engine, Session = setup(url, args.couriers)
+    mismatched = buffered(Session, args)
+    if not args.skip_direct:
+        direct(Session, args)
+    engine.dispose()
+    if mismatched:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
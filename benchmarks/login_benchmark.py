@@ -0,0 +1,59 @@
+# Password verifications per second through the hashing process pool used by the logins.
+#
+#   python benchmarks/login_benchmark.py --rounds 10 12 --workers 1 2 4 --logins 200
+#
+# Each run hashes one password at the given bcrypt cost, then submits --logins
+# verifications at once through hashing.HashPool (with the queue bound lifted) and
+# reports throughput overall and per worker process.
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashing import HashPool, make_context
+
+async def verify_all(pool: HashPool, stored: str, logins: int):
+    results = await asyncio.gather(*(pool.verify_and_update_async("benchmark-password", stored)
+                                     for _ in range(logins)))
+    assert all(valid for valid, _ in results)
+
+def run(rounds: int, workers: int, logins: int):
+    stored = make_context(rounds).hash("benchmark-password")
+    pool = HashPool(rounds=rounds, workers=workers, max_pending=logins)
+    try:
+        # Start the worker processes outside the timed section
+        asyncio.run(verify_all(pool, stored, workers))
+        started = time.perf_counter()
+        asyncio.run(verify_all(pool, stored, logins))
+        seconds = time.perf_counter() - started
+    finally:
+        pool.shutdown()
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "logins": logins,
+        "logins_per_s": logins / seconds,
+        "per_worker": logins / seconds / workers,
+        "ms_per_login": seconds / logins * workers * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Login verification throughput of the bcrypt process pool")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--logins", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"cpu cores: {os.cpu_count()}")
+    print(f"{'rounds':>6} {'workers':>8} {'logins':>7} {'logins/s':>9} {'per core':>9} {'ms/login':>9}")
+    for rounds in args.rounds:
+        for workers in sorted(set(args.workers)):
+            result = run(rounds, workers, args.logins)
+            print(f"{result['rounds']:>6} {result['workers']:>8} {result['logins']:>7} {result['logins_per_s']:>9.1f} "
+                  f"{result['per_worker']:>9.1f} {result['ms_per_login']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
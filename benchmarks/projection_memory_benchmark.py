@@ -0,0 +1,87 @@
+# Memory and time to load a large read-only list as ORM entities against the column
+# projections the crud list queries use.
+#
+#   python benchmarks/projection_memory_benchmark.py --rows 100000
+#
+# Each list is loaded both ways inside tracemalloc: peak is the most memory held while the
+# result is built, retained what the result still holds once the query is done (the
+# session's identity map included). Both are reported per 100k rows. No config.json is
+# needed (the app modules fall back to their defaults without one); the data lives in a
+# temporary SQLite file.
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+import crud
+import models
+from pagination import PageParams
+
+def seed(engine, rows: int):
+    with engine.begin() as connection:
+        connection.execute(insert(models.Customer.__table__), [{"id": 1, "name": "customer"}])
+        connection.execute(insert(models.RestaurantOwner.__table__), [
+            {"id": i, "restaurant_name": f"Restaurant {i}", "address": f"{i} Market Street",
+             "hours_of_operation": "Mon-Sun 10:00-22:00", "latitude": 12.9, "longitude": 77.6}
+            for i in range(1, rows + 1)])
+        connection.execute(insert(models.Order.__table__), [
+            {"id": i, "customer_id": 1, "restaurant_owner_id": i % 50 + 1, "status": "pending",
+             "total_amount": i % 900 + 100} for i in range(1, rows + 1)])
+        connection.execute(insert(models.Menu.__table__), [
+            {"id": i, "restaurant_owner_id": 1, "name": f"Dish {i}", "description": "Made to order",
+             "price": i % 500 + 50, "availability": True} for i in range(1, rows + 1)])
+
+# (peak bytes, retained bytes, seconds, rows) of load(db) in a fresh session
+def measure(Session, load):
+    db = Session()
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load(db)
+    seconds = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = len(result)
+    del result
+    db.close()
+    return peak, retained, seconds, rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per 100k rows, ORM entities against column projections")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/projection.db")
+    models.Base.metadata.create_all(engine)
+    seed(engine, args.rows)
+    Session = sessionmaker(bind=engine)
+    everything = PageParams(limit=args.rows)
+
+    cases = [
+        ("restaurants", lambda db: db.query(models.RestaurantOwner).order_by(models.RestaurantOwner.id).all(),
+         lambda db: crud.get_restaurants(db, everything)[0]),
+        ("orders", lambda db: db.query(models.Order).order_by(models.Order.id).all(),
+         lambda db: crud.get_orders(db, everything)[0]),
+        ("menu", lambda db: db.query(models.Menu).filter(models.Menu.restaurant_owner_id == 1).all(),
+         lambda db: crud.get_menu_rows(db, 1)),
+    ]
+    per = 100000 / args.rows / 2 ** 20
+    print(f"{args.rows} rows each, MiB per 100k rows")
+    print(f"{'list':<12}{'path':<10}{'peak':>9}{'retained':>10}{'ms':>9}")
+    for name, *loads in cases:
+        for path, load in zip(("entities", "columns"), loads):
+            peak, retained, seconds, rows = measure(Session, load)
+            if rows != args.rows:
+                raise SystemExit(f"{name} {path}: loaded {rows} rows, expected {args.rows}")
+            print(f"{name:<12}{path:<10}{peak * per:>9.1f}{retained * per:>10.1f}{seconds * 1000:>9.0f}")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Compare the two ways a large list response is serialized: through its response_model
+# schema one object at a time, as FastAPI does by default, and straight from the rows with
+# serialization.RowEncoder (serialization.fast_json).
+#
+#   python benchmarks/serialization_benchmark.py --rows 10000
+#
+# Both paths start from the rows the crud query returns and end with the response body
+# bytes; the bodies are checked to decode to the same JSON. No config.json is needed (the
+# app modules fall back to their defaults without one); the data lives in an in-memory
+# SQLite database.
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import crud
+import models
+import schemas
+import serialization
+from pagination import PageParams
+
+def seed(db, rows: int):
+    db.add_all([models.Customer(id=1, name="customer"), models.RestaurantOwner(id=1, restaurant_name="restaurant")])
+    db.add_all([models.Order(id=i, customer_id=1, restaurant_owner_id=1, status="pending", total_amount=i % 900 + 100)
+                for i in range(1, rows + 1)])
+    db.add_all([models.Menu(id=i, restaurant_owner_id=1, name=f"Dish {i}", description="Made to order",
+                            price=i % 500 + 50, availability=bool(i % 7)) for i in range(1, rows + 1)])
+    db.commit()
+
+# response_model path: validate into the schema reading attributes, dump to JSON types,
+# then encode with the standard library as JSONResponse does
+def model_path(schema):
+    try:
+        from pydantic import TypeAdapter
+    except ImportError:  # pydantic 1
+        from fastapi.encoders import jsonable_encoder
+        from pydantic import parse_obj_as
+        return lambda value: json.dumps(jsonable_encoder(parse_obj_as(schema, value)), ensure_ascii=False,
+                                        separators=(",", ":")).encode()
+    adapter = TypeAdapter(schema)
+    return lambda value: json.dumps(adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json"),
+                                    ensure_ascii=False, separators=(",", ":")).encode()
+
+def measure(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), body
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization cost of large list responses")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.rows)
+
+    orders, next_cursor = crud.get_orders(db, PageParams(limit=args.rows))
+    menu = crud.get_menu_rows(db, 1)
+    order_page = model_path(schemas.OrderPage)
+    menu_list = model_path(List[schemas.MenuBase])
+
+    cases = [
+        ("orders (OrderPage)",
+         lambda: order_page({"items": orders, "next_cursor": next_cursor}),
+         lambda: serialization.page_response(serialization.order_rows, orders, next_cursor).body),
+        ("menu (List[MenuBase])",
+         lambda: menu_list(menu),
+         lambda: serialization.dumps(serialization.menu_rows.encode(menu))),
+    ]
+    print(f"{len(orders)} orders, {len(menu)} menu items, orjson {'installed' if serialization.orjson else 'not installed'}")
+    print(f"{'response':<24} {'response_model ms':>18} {'rows ms':>10} {'speedup':>8}")
+    for name, slow, fast in cases:
+        slow_seconds, slow_body = measure(slow, args.repeat)
+        fast_seconds, fast_body = measure(fast, args.repeat)
+        if json.loads(slow_body) != json.loads(fast_body):
+            raise SystemExit(f"{name}: the two paths produce different JSON")
+        print(f"{name:<24} {slow_seconds * 1000:>18.1f} {fast_seconds * 1000:>10.1f} {slow_seconds / fast_seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
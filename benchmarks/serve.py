@@ -0,0 +1,15 @@
+# Start the app for load tests: `uvicorn main:app` with the routers.py/ package importable
+# (see app_path.py). The arguments are passed to uvicorn, and config.json is read from the
+# working directory.
+#
+#   python benchmarks/serve.py --workers 4 --port 8000
+import subprocess
+import sys
+
+from app_path import app_env
+
+def main():
+    return subprocess.call([sys.executable, "-m", "uvicorn", "main:app", *sys.argv[1:]], env=app_env())
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# Import-to-ready time of a fresh worker process.
+#
+#   python benchmarks/startup_benchmark.py --runs 10
+#   python benchmarks/startup_benchmark.py --config /etc/food_delivery/config.json --warm-up 5
+#
+# Each run starts a new interpreter that imports main and enters the app lifespan
+# (engine, migrations, pool warm-up, background jobs), as a uvicorn worker does. Without
+# --config the workers use a temporary SQLite database; the first run creates its schema.
+# The workers find the routers.py/ package through benchmarks/app_path.py.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from app_path import app_env
+
+WORKER = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def ready():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+print(json.dumps({"import_s": imported - started, "lifespan_s": asyncio.run(ready()) - imported}))
+"""
+
+def run_worker(workdir: str, env: dict):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", WORKER], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["total_s"] = time.perf_counter() - started
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-to-ready time of a new app worker")
+    parser.add_argument("--config", help="config.json to start with, defaults to a temporary SQLite database")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", type=int, default=0, help="startup.warm_up_connections")
+    parser.add_argument("--no-migrate", action="store_true", help="set startup.migrate to false")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    if args.config:
+        with open(args.config) as config_file:
+            config = json.load(config_file)
+    else:
+        config = {"database": {"url": f"sqlite:///{workdir}/startup.db"}}
+    config.setdefault("startup", {}).update({"warm_up_connections": args.warm_up, "migrate": not args.no_migrate})
+    with open(os.path.join(workdir, "config.json"), "w") as config_file:
+        json.dump(config, config_file)
+
+    env = app_env()
+    if not args.config:
+        run_worker(workdir, env)  # create the schema so every measured run starts from the same state
+    results = [run_worker(workdir, env) for _ in range(args.runs)]
+    print(f"{args.runs} runs, median of each phase")
+    for phase in ("import_s", "lifespan_s", "total_s"):
+        values = sorted(result[phase] for result in results)
+        print(f"{phase[:-2]:>9}: {statistics.median(values) * 1000:8.1f} ms  (min {values[0] * 1000:.1f}, max {values[-1] * 1000:.1f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from database import config
+
+cache_config = config.get('cache', {})
+
+# Per-restaurant cache of serialized menus, bounded in size with LRU and TTL eviction.
+# Entries are dropped by invalidate() from every menu write path in crud.
+class MenuCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # restaurant_id -> (expires_at, etag, items)
+        self._generations = {}  # restaurant_id -> number of invalidations seen
+        self._lock = threading.Lock()
+
+    def get(self, restaurant_id: int):
+        with self._lock:
+            entry = self._entries.get(restaurant_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[restaurant_id]
+                return None
+            self._entries.move_to_end(restaurant_id)
+            return entry[1], entry[2]
+
+    # Take before reading from the database and pass to set(), so a read that raced
+    # with a write is never cached
+    def generation(self, restaurant_id: int):
+        with self._lock:
+            return self._generations.get(restaurant_id, 0)
+
+    # ttl_seconds overrides the default lifetime for this entry
+    def set(self, restaurant_id: int, items: list, generation: int, ttl_seconds: float = None):
+        body = json.dumps(items, sort_keys=True, separators=(",", ":"), default=str)
+        etag = '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+        with self._lock:
+            if self._generations.get(restaurant_id, 0) == generation:
+                ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+                self._entries[restaurant_id] = (time.monotonic() + ttl, etag, items)
+                self._entries.move_to_end(restaurant_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag, items
+
+    def invalidate(self, restaurant_id: int):
+        with self._lock:
+            self._entries.pop(restaurant_id, None)
+            self._generations[restaurant_id] = self._generations.get(restaurant_id, 0) + 1
+
+# Check an If-None-Match header against the current ETag
+def etag_matches(if_none_match, etag: str):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+menu_cache = MenuCache(
+    max_entries=cache_config.get('menu_max_entries', 1024),
+    ttl_seconds=cache_config.get('menu_ttl_seconds', 300),
+)
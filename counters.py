@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import random
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import models
+from database import config, SessionLocal, upsert
+
+logger = logging.getLogger(__name__)
+
+counters_config = config.get('counters', {})
+RECONCILE_SECONDS = counters_config.get('reconcile_seconds', 300)
+# Rows each counter is spread over: concurrent writers increment different rows instead of
+# queueing on one row lock, and a counter's value is the sum of its rows
+SHARDS = counters_config.get('shards', 8)
+
+ACTIVE_USERS = "active_users"
+ORDERS_PENDING = "orders_pending"
+ORDERS_IN_PROGRESS = "orders_in_progress"
+ORDERS_COMPLETED = "orders_completed"
+TOTAL_DELIVERIES = "total_deliveries"
+COUNTERS = (ACTIVE_USERS, ORDERS_PENDING, ORDERS_IN_PROGRESS, ORDERS_COMPLETED, TOTAL_DELIVERIES)
+
+# Which counter an order with this status is counted in
+def order_counter(status: str):
+    if status == "pending":
+        return ORDERS_PENDING
+    if status == "delivered":
+        return ORDERS_COMPLETED
+    return ORDERS_IN_PROGRESS
+
+# Admins are not counted as platform users
+def is_active_user(role: str, active: bool):
+    return bool(active) and role != "admin"
+
+# Increments are issued inside the caller's transaction and commit with the write they count.
+# Each lands on a random shard row, inserted on first use.
+def _increment(db: Session, name: str, delta: int, shard: int):
+    upsert(db, models.ActivityCounter.__table__, [{"name": name, "shard": shard, "value": delta}],
+           ["name", "shard"], ["value"], increment=True)
+
+def bump(db: Session, name: str, delta: int = 1):
+    if delta:
+        _increment(db, name, delta, random.randrange(SHARDS))
+
+def order_status_changed(db: Session, old_status: str = None, new_status: str = None):
+    old = order_counter(old_status) if old_status is not None else None
+    new = order_counter(new_status) if new_status is not None else None
+    if old != new:
+        if old:
+            bump(db, old, -1)
+        if new:
+            bump(db, new, 1)
+
+def user_changed(db: Session, was_active: bool, is_active: bool):
+    bump(db, ACTIVE_USERS, int(is_active) - int(was_active))
+
+# Current totals, one primary-key range read summed per counter
+def snapshot(db: Session):
+    values = dict.fromkeys(COUNTERS, 0)
+    values.update(
+        db.query(models.ActivityCounter.name, func.sum(models.ActivityCounter.value))
+        .group_by(models.ActivityCounter.name).all()
+    )
+    return {name: int(value) for name, value in values.items()}
+
+def _count(model, *conditions):
+    return select(func.count(model.id)).where(*conditions).scalar_subquery()
+
+# The true value of each counter, counted from the source tables
+def _sources():
+    order_status = models.Order.status
+    return {
+        ACTIVE_USERS: _count(models.User, models.User.active == True, models.User.role != "admin"),
+        ORDERS_PENDING: _count(models.Order, order_status == "pending"),
+        ORDERS_IN_PROGRESS: _count(models.Order, or_(order_status.is_(None),
+                                                     order_status.not_in(("pending", "delivered")))),
+        ORDERS_COMPLETED: _count(models.Order, order_status == "delivered"),
+        TOTAL_DELIVERIES: _count(models.Delivery),
+    }
+
+# Recompute every counter from the source tables and correct the running totals, one
+# counter per transaction. Its shard 0 row is locked first (an increment by 0, inserting the
+# row if missing), so reconciles on other workers wait and then read the corrected sum
+# instead of adding the same difference again. The true count and the current sum are then
+# read in one statement, so from one snapshot: a bump committed after it is in neither, and
+# one committed before it is in both. The difference is added, never written as an absolute
+# value, so no concurrent bump is lost. Bumps to the other shards do not wait, and one row
+# lock is held at a time.
+def reconcile(db: Session):
+    db.commit()  # the lock must come before the read
+    values = {}
+    for name, source in _sources().items():
+        _increment(db, name, 0, 0)
+        current = select(func.coalesce(func.sum(models.ActivityCounter.value), 0)) \
+            .where(models.ActivityCounter.name == name).scalar_subquery()
+        values[name], current = db.execute(select(source, current)).one()
+        difference = values[name] - int(current)
+        if difference:
+            _increment(db, name, difference, 0)
+        db.commit()
+    return values
+
+def _reconcile_once():
+    db = SessionLocal()
+    try:
+        reconcile(db)
+    finally:
+        db.close()
+
+# Background job started with the app: reconcile now, then every counters.reconcile_seconds
+async def reconcile_periodically(interval: float = RECONCILE_SECONDS):
+    while True:
+        try:
+            await run_in_threadpool(_reconcile_once)
+        except Exception:
+            logger.exception("Activity counter reconciliation failed")
+        await asyncio.sleep(interval)
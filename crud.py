@@ -1,11 +1,38 @@
 from sqlalchemy.orm import Session
 import models, schemas
-from sqlalchemy import update
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import update, select, func, insert, and_, or_
+from sqlalchemy.exc import IntegrityError
+from cache import menu_cache
+from search import menu_index, MENU_FIELDS
+from database import upsert, update_row
+from pagination import PageParams, paginate
+import auth, counters, rollups, events, hours
+from dispatch import dispatcher, ASSIGNED_STATUS
+
+# A write aimed at a row of another customer, restaurant or courier; the routers answer 403
+class NotOwner(Exception):
+    pass
+
+# A menu item named like another item of the same restaurant (uq_menus_restaurant_name); the
+# routers answer 409
+class DuplicateMenuName(Exception):
+    pass
+
+# Commit a new or renamed menu item, turning a clash on its name into DuplicateMenuName
+def _commit_menu(db: Session, name: str):
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise DuplicateMenuName(f"The restaurant already has a menu item named {name!r}")
 
 # User CRUD
 def create_user(db: Session, user: schemas.UserUpdate):
-    db_user = models.User(username=user.username, password=user.password, role=user.role)
+    db_user = models.User(username=user.username, password=auth.hash_password(user.password), role=user.role)
     db.add(db_user)
+    counters.user_changed(db, False, counters.is_active_user(user.role, True))
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -13,23 +40,35 @@ def create_user(db: Session, user: schemas.UserUpdate):
 def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if db_user:
+        was_active = counters.is_active_user(db_user.role, db_user.active)
         if user_update.username:
             db_user.username = user_update.username
         if user_update.password:
-            db_user.password = user_update.password
+            db_user.password = auth.hash_password(user_update.password)
         if user_update.role:
             db_user.role = user_update.role
+        counters.user_changed(db, was_active, counters.is_active_user(db_user.role, db_user.active))
         db.commit()
         db.refresh(db_user)
         return db_user
     return None
 
+# Columns returned for a user by writes, never the password hash
+USER_COLUMNS = (models.User.id, models.User.username, models.User.role, models.User.active)
+
+# Only an active user is updated, so the row that comes back was active before and the
+# active user counter moves exactly once. None when the user does not exist.
 def deactivate_user(db: Session, user_id: int):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
-    db_user.active = False  # Assuming there's an 'active' field to mark user as inactive
+    user = update_row(db, models.User, user_id, {"active": False}, returning=USER_COLUMNS,
+                      where=(models.User.active == True,))
+    if user is None:
+        # Nothing was updated: either the user is already inactive, or there is no such user.
+        # This read tells the two apart, returning the inactive user unchanged (the counters
+        # already left it out) or None.
+        return db.query(*USER_COLUMNS).filter(models.User.id == user_id).first()
+    counters.user_changed(db, counters.is_active_user(user.role, True), False)
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    return user
 
 # Customer CRUD
 def create_customer(db: Session, customer: schemas.CustomerCreate):
@@ -45,40 +84,306 @@ def create_customer(db: Session, customer: schemas.CustomerCreate):
 def get_customer(db: Session, user_id: int):
     return db.query(models.Customer).filter(models.Customer.user_id == user_id).first()
 
+# Restaurant CRUD
+def get_restaurant(db: Session, restaurant_owner_id: int):
+    return db.query(models.RestaurantOwner.id, models.RestaurantOwner.restaurant_name).filter(models.RestaurantOwner.id == restaurant_owner_id).first()
+
+# Read-only lists select the columns of their response schema and return plain rows: no
+# entity is built, tracked in the identity map or expired on commit
+def get_restaurants(db: Session, page: PageParams, open_minute: int = None):
+    query = db.query(
+        models.RestaurantOwner.id, models.RestaurantOwner.restaurant_name, models.RestaurantOwner.address,
+        models.RestaurantOwner.hours_of_operation, models.RestaurantOwner.latitude, models.RestaurantOwner.longitude,
+    )
+    if open_minute is not None:
+        # Restaurants open at that minute of the week (hours.minute_of_week), read from
+        # ix_restaurant_hours_open alone. Stored intervals are at most a day long, which bounds
+        # the index range to the intervals opened in the last day; a restaurant's intervals
+        # never overlap.
+        open_restaurants = select(models.RestaurantHours.restaurant_owner_id).where(
+            models.RestaurantHours.opens_at > open_minute - hours.MINUTES_PER_DAY,
+            models.RestaurantHours.opens_at <= open_minute, models.RestaurantHours.closes_at > open_minute,
+        )
+        query = query.filter(models.RestaurantOwner.id.in_(open_restaurants))
+    return paginate(query, models.RestaurantOwner.id, page)
+
+# Replace the weekly intervals of a restaurant with those read from its hours_of_operation
+# text; the caller commits. Text hours.parse cannot read is kept as written and leaves the
+# restaurant without intervals (it is then never listed as open), as migration 4 does.
+# Returns whether the text was read.
+def set_hours(db: Session, restaurant_owner_id: int, text: str):
+    try:
+        intervals = hours.parse(text)
+    except ValueError:
+        intervals = None
+    db.query(models.RestaurantHours).filter(models.RestaurantHours.restaurant_owner_id == restaurant_owner_id).delete(
+        synchronize_session=False)
+    if intervals:
+        db.execute(insert(models.RestaurantHours), [
+            {"restaurant_owner_id": restaurant_owner_id, "opens_at": opens, "closes_at": closes}
+            for opens, closes in hours.split_days(intervals)
+        ])
+    return intervals is not None
+
+# Columns of schemas.MenuBase
+def get_menu_rows(db: Session, restaurant_id: int):
+    return (
+        db.query(models.Menu.name, models.Menu.description, models.Menu.price, models.Menu.availability)
+        .filter(models.Menu.restaurant_owner_id == restaurant_id)
+        .all()
+    )
+
 # Order CRUD
-def get_orders(db: Session):
-    return db.query(models.Order).all()
+# Paginated order listings, optionally filtered on status
+def _order_page(query, page: PageParams, status: str = None, descending: bool = False):
+    if status:
+        query = query.filter(models.Order.status == status)
+    return paginate(query, models.Order.id, page, descending=descending)
 
-def manage_order(db: Session, order_id: int, status: str):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+# Flat projection for order lists (schemas.OrderResponse): the customer and restaurant names
+# come from joins in the same statement, so a page never lazy-loads them row by row
+def _order_list_query(db: Session):
+    return (
+        db.query(
+            models.Order.id, models.Order.customer_id, models.Order.restaurant_owner_id,
+            models.Order.status, models.Order.total_amount,
+            models.Customer.name.label("customer"),
+            models.RestaurantOwner.restaurant_name.label("restaurant_owner"),
+        )
+        .outerjoin(models.Customer, models.Customer.id == models.Order.customer_id)
+        .outerjoin(models.RestaurantOwner, models.RestaurantOwner.id == models.Order.restaurant_owner_id)
+    )
+
+def get_orders(db: Session, page: PageParams, status: str = None):
+    return _order_page(_order_list_query(db), page, status)
+
+def get_restaurant_orders(db: Session, restaurant_owner_id: int, page: PageParams, status: str = None):
+    query = _order_list_query(db).filter(models.Order.restaurant_owner_id == restaurant_owner_id)
+    return _order_page(query, page, status)
+
+# Newest first
+def get_customer_orders(db: Session, customer_id: int, page: PageParams, status: str = None):
+    query = _order_list_query(db).filter(models.Order.customer_id == customer_id)
+    return _order_page(query, page, status, descending=True)
+
+# Id and status, all that order tracking shows, and the customer it belongs to
+def get_order(db: Session, order_id: int):
+    return db.query(models.Order.id, models.Order.status, models.Order.customer_id) \
+        .filter(models.Order.id == order_id).first()
+
+# The previous status is needed for the counters and rollups: only the columns they use are
+# read, locked until the commit so concurrent changes to the same order apply one after the
+# other. Returns True, not the order: nothing is reloaded after the commit. Returns None when
+# the order does not exist. With restaurant_owner_id, raises NotOwner for an order of another
+# restaurant.
+def manage_order(db: Session, order_id: int, status: str, restaurant_owner_id: int = None):
+    order = (
+        db.query(models.Order.status, models.Order.restaurant_owner_id, models.Order.created_at)
+        .filter(models.Order.id == order_id)
+        .with_for_update()
+        .first()
+    )
     if not order:
         return None
-    order.status = status
+    if restaurant_owner_id is not None and order.restaurant_owner_id != restaurant_owner_id:
+        db.rollback()
+        raise NotOwner()
+    counters.order_status_changed(db, order.status, status)
+    rollups.order_status_changed(db, order, order.status, status)
+    update_row(db, models.Order, order_id, {"status": status})
+    db.commit()
+    events.order_status_changed(order_id, status)
+    return True
+
+# Order placement: one locked IN (...) read covers the menu items of every order in the
+# batch, then the orders, their items and the report bookkeeping go out in a single commit
+def _order_error(order: schemas.OrderCreate, menus: dict, customer_ids: set):
+    if not order.items:
+        return "Order has no items"
+    if order.customer_id not in customer_ids:
+        return f"Customer {order.customer_id} not found"
+    for item in order.items:
+        menu = menus.get(item.menu_id)
+        if menu is None or menu.restaurant_owner_id != order.restaurant_owner_id:
+            return f"Menu item {item.menu_id} not found for restaurant {order.restaurant_owner_id}"
+        if not menu.availability:
+            return f"Menu item {item.menu_id} is not available"
+    return None
+
+def create_orders(db: Session, orders: list):
+    menu_ids = sorted({item.menu_id for order in orders for item in order.items})
+    menus = {}
+    if menu_ids:
+        # Locked in id order so concurrent placements cannot deadlock
+        rows = db.query(models.Menu.id, models.Menu.restaurant_owner_id, models.Menu.price,
+                        models.Menu.availability) \
+            .filter(models.Menu.id.in_(menu_ids)).order_by(models.Menu.id).with_for_update().all()
+        menus = {row.id: row for row in rows}
+    customer_ids = {customer_id for customer_id, in db.query(models.Customer.id)
+                    .filter(models.Customer.id.in_({order.customer_id for order in orders}))}
+
+    placements = []
+    placed = []
+    created_at = datetime.utcnow()
+    for order in orders:
+        error = _order_error(order, menus, customer_ids)
+        if error:
+            placements.append(schemas.OrderPlacement(error=error))
+            continue
+        db_order = models.Order(
+            customer_id=order.customer_id,
+            restaurant_owner_id=order.restaurant_owner_id,
+            status="pending",
+            total_amount=sum(menus[item.menu_id].price * item.quantity for item in order.items),
+            created_at=created_at,
+        )
+        placements.append(db_order)
+        placed.append((db_order, order))
+
+    if placed:
+        db.add_all(db_order for db_order, _ in placed)
+        db.flush()
+        db.execute(insert(models.OrderItem), [
+            {"order_id": db_order.id, "menu_id": item.menu_id, "quantity": item.quantity,
+             "unit_price": menus[item.menu_id].price}
+            for db_order, order in placed for item in order.items
+        ])
+        counters.bump(db, counters.ORDERS_PENDING, len(placed))
+        rollups.orders_created(db, [db_order for db_order, _ in placed])
+        # Read before commit expires the objects
+        placements = [placement if isinstance(placement, schemas.OrderPlacement) else
+                      schemas.OrderPlacement(order_id=placement.id, status=placement.status,
+                                             total_amount=placement.total_amount)
+                      for placement in placements]
+        db.commit()
+    else:
+        db.rollback()
+    return placements
+
+# One order; raises ValueError with the reason when it is rejected (the routers answer 400)
+def create_order(db: Session, order: schemas.OrderCreate):
+    placement, = create_orders(db, [order])
+    if placement.error:
+        raise ValueError(placement.error)
+    return placement
+
+def get_order_items(db: Session, order_id: int):
+    return db.query(models.OrderItem.menu_id, models.OrderItem.quantity) \
+        .filter(models.OrderItem.order_id == order_id).all()
+
+# Delivery CRUD
+# Deliveries of a courier in a given status, flattened with the courier name and order
+# status (schemas.DeliveryResponse) in one statement
+def _delivery_list_query(db: Session, delivery_personnel_id: int, status: str = "available"):
+    return (
+        db.query(
+            models.Delivery.id, models.Delivery.order_id, models.Delivery.delivery_personnel_id,
+            models.Delivery.status, models.Delivery.delivery_time,
+            models.DeliveryPersonnel.name.label("delivery_personnel_name"),
+            models.Order.status.label("order_status"),
+        )
+        .outerjoin(models.DeliveryPersonnel, models.DeliveryPersonnel.id == models.Delivery.delivery_personnel_id)
+        .outerjoin(models.Order, models.Order.id == models.Delivery.order_id)
+        .filter(models.Delivery.delivery_personnel_id == delivery_personnel_id, models.Delivery.status == status)
+    )
+
+def get_deliveries(db: Session, delivery_personnel_id: int, page: PageParams, status: str = "available"):
+    return paginate(_delivery_list_query(db, delivery_personnel_id, status), models.Delivery.id, page)
+
+# Claim an available delivery for a courier with one conditional UPDATE: the database decides
+# the winner, concurrent claims on the same delivery see rowcount 0. A delivery the dispatcher
+# assigned can only be claimed by its courier.
+def claim_delivery(db: Session, delivery_id: int, delivery_personnel_id: int):
+    result = db.execute(
+        update(models.Delivery)
+        .where(models.Delivery.id == delivery_id,
+               or_(models.Delivery.status == "available",
+                   and_(models.Delivery.status == ASSIGNED_STATUS,
+                        models.Delivery.delivery_personnel_id == delivery_personnel_id)))
+        .values(status="picked up", delivery_personnel_id=delivery_personnel_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    claimed = result.rowcount == 1
+    if claimed and events.broker.has_subscribers():
+        order_id = db.query(models.Delivery.order_id).filter(models.Delivery.id == delivery_id).scalar()
+        events.delivery_status_changed(order_id, delivery_id, "picked up", delivery_personnel_id)
+    return claimed
+
+# With delivery_personnel_id, only a delivery of that courier is updated: NotOwner is raised
+# for one of another courier, told apart from a missing one only when nothing was updated
+def update_delivery_status(db: Session, delivery_id: int, status: str, delivery_personnel_id: int = None):
+    where = () if delivery_personnel_id is None else (models.Delivery.delivery_personnel_id == delivery_personnel_id,)
+    delivery = update_row(db, models.Delivery, delivery_id, {"status": status},
+                          returning=(models.Delivery.order_id, models.Delivery.status,
+                                     models.Delivery.delivery_personnel_id), where=where)
+    if delivery is None:
+        if where and db.query(models.Delivery.id).filter(models.Delivery.id == delivery_id).first():
+            db.rollback()
+            raise NotOwner()
+        return None
     db.commit()
-    db.refresh(order)
-    return order
+    events.delivery_status_changed(delivery.order_id, delivery_id, delivery.status, delivery.delivery_personnel_id)
+    return delivery
+
+# One UPDATE; the position comes back for the dispatcher, the stored one when none was sent
+def set_availability(db: Session, delivery_personnel_id: int, availability: schemas.DeliveryAvailability):
+    values = {"is_available": availability.available}
+    if availability.latitude is not None and availability.longitude is not None:
+        values.update(latitude=availability.latitude, longitude=availability.longitude,
+                      location_reported_at=datetime.utcnow())
+    courier = update_row(db, models.DeliveryPersonnel, delivery_personnel_id, values,
+                         returning=(models.DeliveryPersonnel.id, models.DeliveryPersonnel.is_available,
+                                    models.DeliveryPersonnel.latitude, models.DeliveryPersonnel.longitude))
+    if courier is None:
+        return None
+    db.commit()
+    return courier
+
+_POSITION_COLUMNS = (models.DeliveryPersonnel.id, models.DeliveryPersonnel.latitude,
+                     models.DeliveryPersonnel.longitude, models.DeliveryPersonnel.location_reported_at)
+
+def get_courier_position(db: Session, delivery_personnel_id: int):
+    return db.query(*_POSITION_COLUMNS).filter(models.DeliveryPersonnel.id == delivery_personnel_id).first()
+
+# Stored positions of the given couriers (all when None), reported at or after since when given
+def get_courier_positions(db: Session, courier_ids=None, since: datetime = None):
+    query = db.query(*_POSITION_COLUMNS).filter(models.DeliveryPersonnel.latitude != None,
+                                               models.DeliveryPersonnel.longitude != None)
+    if courier_ids is not None:
+        query = query.filter(models.DeliveryPersonnel.id.in_(courier_ids))
+    if since is not None:
+        query = query.filter(models.DeliveryPersonnel.location_reported_at >= since)
+    return query.all()
 
 # Report CRUD
-def get_most_popular_restaurants(db: Session):
-    return db.query(models.RestaurantOwner.restaurant_name, db.func.count(models.Order.id).label("order_count")) \
-        .join(models.Order, models.Order.restaurant_owner_id == models.RestaurantOwner.id) \
-        .group_by(models.RestaurantOwner.id) \
-        .order_by(db.func.count(models.Order.id).desc()).limit(5).all()
+# Popularity and trends read the order_rollups table, optionally limited to [start, end)
+def get_most_popular_restaurants(db: Session, start: datetime = None, end: datetime = None):
+    return rollups.popular_restaurants(db, start, end)
 
 def get_average_delivery_time(db: Session):
-    return db.query(db.func.avg(models.Delivery.delivery_time).label("avg_delivery_time")).scalar()
+    return db.query(func.avg(models.Delivery.delivery_time).label("avg_delivery_time")).scalar()
 
-def get_order_trends(db: Session):
-    return db.query(models.Order.status, db.func.count(models.Order.id).label("order_count")) \
-        .group_by(models.Order.status).all()
+def get_order_trends(db: Session, start: datetime = None, end: datetime = None):
+    return rollups.order_trends(db, start, end)
 
 # Menu CRUD
+# Called after every committed menu write so the menu cache and search index never go stale
+def _menu_saved(db_menu: models.Menu):
+    menu_cache.invalidate(db_menu.restaurant_owner_id)
+    menu_index.add(db_menu)
+
+def _menu_deleted(menu_id: int, restaurant_owner_id: int):
+    menu_cache.invalidate(restaurant_owner_id)
+    menu_index.remove(menu_id)
+
 def create_menu(db: Session, menu: schemas.MenuBase):
     db_menu = models.Menu(restaurant_owner_id=menu.restaurant_owner_id, name=menu.name,
                           description=menu.description, price=menu.price, availability=menu.availability)
     db.add(db_menu)
     db.commit()
     db.refresh(db_menu)
+    _menu_saved(db_menu)
     return db_menu
 
 def update_menu(db: Session, menu_id: int, menu: schemas.MenuBase):
@@ -89,15 +394,18 @@ def update_menu(db: Session, menu_id: int, menu: schemas.MenuBase):
     db_menu.description = menu.description
     db_menu.price = menu.price
     db_menu.availability = menu.availability
-    db.commit()
+    _commit_menu(db, menu.name)
     db.refresh(db_menu)
+    _menu_saved(db_menu)
     return db_menu
 
 def delete_menu(db: Session, menu_id: int):
     db_menu = db.query(models.Menu).filter(models.Menu.id == menu_id).first()
     if db_menu:
+        restaurant_owner_id = db_menu.restaurant_owner_id
         db.delete(db_menu)
         db.commit()
+        _menu_deleted(menu_id, restaurant_owner_id)
     return db_menu
 # Function to create a new delivery personnel
 def create_delivery_personnel(db: Session, delivery_personnel: schemas.DeliveryPersonnelCreate):
@@ -114,11 +422,12 @@ def create_restaurant_owner(db: Session, restaurant_owner: schemas.RestaurantOwn
     # Create a new user for the restaurant owner
     db_user = models.User(
         username=restaurant_owner.username,
-        password=restaurant_owner.password,  # You should hash the password in production
+        password=auth.hash_password(restaurant_owner.password),
         role="restaurant_owner"
     )
     
     db.add(db_user)
+    counters.user_changed(db, False, True)
     db.commit()
     db.refresh(db_user)
 
@@ -127,20 +436,26 @@ def create_restaurant_owner(db: Session, restaurant_owner: schemas.RestaurantOwn
         user_id=db_user.id,
         restaurant_name=restaurant_owner.restaurant_name,
         address=restaurant_owner.address,
-        hours_of_operation=restaurant_owner.hours_of_operation
+        hours_of_operation=restaurant_owner.hours_of_operation,
+        latitude=restaurant_owner.latitude,
+        longitude=restaurant_owner.longitude
     )
     
     db.add(db_restaurant_owner)
+    db.flush()
+    set_hours(db, db_restaurant_owner.id, db_restaurant_owner.hours_of_operation)
     db.commit()
     db.refresh(db_restaurant_owner)
+    dispatcher.restaurant_changed(db_restaurant_owner.id, db_restaurant_owner.latitude, db_restaurant_owner.longitude)
     
     return db_restaurant_owner
 
 
 # Function to create a new menu item
-def create_menu_item(db: Session, menu: schemas.MenuCreate):
+def create_menu_item(db: Session, menu: schemas.MenuCreate, restaurant_owner_id: int = None):
     # Create a new menu item
     db_menu = models.Menu(
+        restaurant_owner_id=restaurant_owner_id,
         name=menu.name,
         description=menu.description,
         price=menu.price,
@@ -148,34 +463,85 @@ def create_menu_item(db: Session, menu: schemas.MenuCreate):
     )
     
     db.add(db_menu)
-    db.commit()
+    _commit_menu(db, menu.name)
     db.refresh(db_menu)
+    _menu_saved(db_menu)
     
     return db_menu
-# Function to generate a report based on report_type
-def generate_report(report_type: str, db: Session):
-    # Based on the report_type, query the database and return the data
-    if report_type == "orders":
-        # Example: Retrieve all orders
-        return db.query(models.Order).all()  # You can customize this based on your needs
-    elif report_type == "users":
-        # Example: Retrieve all users
-        return db.query(models.User).all()  # You can customize this based on your needs
-    else:
+# Columns exported by generate_report, passwords are never included
+REPORT_COLUMNS = {
+    "orders": (models.Order.id, models.Order.customer_id, models.Order.restaurant_owner_id,
+               models.Order.status, models.Order.total_amount),
+    "users": (models.User.id, models.User.username, models.User.role, models.User.active),
+}
+
+# Bulk menu import: rows are validated one at a time and written as multi-row upserts keyed on
+# (restaurant_owner_id, name), all in one transaction that finish() commits. Rows are handed
+# over batch by batch (add) while the request body is still being parsed. Invalid rows are
+# reported, not fatal. A name given more than once is one item, the last row wins.
+IMPORT_BATCH_SIZE = 1000
+
+class MenuImport:
+    def __init__(self, restaurant_owner_id: int):
+        self.restaurant_owner_id = restaurant_owner_id
+        self.rows = 0
+        self.names = set()
+        self.errors = []
+
+    def add(self, db: Session, rows):
+        batch = {}
+        for row in rows:
+            self.rows += 1
+            try:
+                if not isinstance(row, dict):
+                    raise TypeError("row must be an object")
+                item = schemas.MenuCreate(**row)
+            except (ValidationError, TypeError) as exc:
+                detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors()) \
+                    if isinstance(exc, ValidationError) else str(exc)
+                self.errors.append({"row": self.rows, "error": detail})
+                continue
+            # The same name twice in a statement is one upsert
+            batch[item.name] = {"restaurant_owner_id": self.restaurant_owner_id, "name": item.name,
+                                "description": item.description, "price": item.price,
+                                "availability": item.availability}
+            self.names.add(item.name)
+        upsert(db, models.Menu.__table__, list(batch.values()), ["restaurant_owner_id", "name"],
+               ["description", "price", "availability"])
+
+    def finish(self, db: Session):
+        db.commit()
+        menu_cache.invalidate(self.restaurant_owner_id)
+        for menu in db.query(*(getattr(models.Menu, field) for field in MENU_FIELDS)) \
+                .filter(models.Menu.restaurant_owner_id == self.restaurant_owner_id):
+            menu_index.add(menu)
+        return {"imported": len(self.names), "errors": self.errors}
+
+# Function to generate a report based on report_type, one page at a time
+def generate_report(report_type: str, db: Session, page: PageParams):
+    columns = REPORT_COLUMNS.get(report_type)
+    if columns is None:
         # Handle invalid report type
-        return {"error": "Invalid report type"}
+        return None
+    rows, next_cursor = paginate(db.query(*columns), columns[0], page)
+    return [dict(row._mapping) for row in rows], next_cursor
+
+# Iterate over every row of a report through a server-side cursor, batch_size rows at a time
+def stream_report_rows(report_type: str, db: Session, batch_size: int = 1000):
+    columns = REPORT_COLUMNS[report_type]
+    statement = select(*columns).order_by(columns[0]).execution_options(yield_per=batch_size)
+    for partition in db.execute(statement).partitions():
+        yield from partition
+# Platform activity from the running counters, no table scans
 def generate_activity_report(db: Session):
-    # Example data, this should be dynamically fetched based on your platform's actual data
-    active_users = db.query(models.User).filter(models.User.is_active == True).count()
-    total_deliveries = db.query(models.Delivery).count()
-    orders_pending = db.query(models.Order).filter(models.Order.status == 'pending').count()
-    orders_completed = db.query(models.Order).filter(models.Order.status == 'delivered').count()
+    activity = counters.snapshot(db)
     platform_uptime = "99.9%"  # This can be calculated based on uptime data if available
 
     return {
-        'active_users': active_users,
-        'total_deliveries': total_deliveries,
-        'orders_pending': orders_pending,
-        'orders_completed': orders_completed,
+        'active_users': activity[counters.ACTIVE_USERS],
+        'total_deliveries': activity[counters.TOTAL_DELIVERIES],
+        'orders_pending': activity[counters.ORDERS_PENDING],
+        'orders_in_progress': activity[counters.ORDERS_IN_PROGRESS],
+        'orders_completed': activity[counters.ORDERS_COMPLETED],
         'platform_uptime': platform_uptime
-    }
\ No newline at end of file
+    }
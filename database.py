@@ -1,21 +1,155 @@
 import json
-from sqlalchemy import create_engine
+import os
+import threading
+from sqlalchemy import create_engine, select, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+import metrics
+import replicas
 
 
-with open('config.json') as config_file:
-    config = json.load(config_file)
+# Settings are read at import, but nothing connects until init_engine() runs (from the
+# app lifespan, or on first use of get_engine()), so importing the app needs no database
+def load_config(path: str = 'config.json'):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as config_file:
+        return json.load(config_file)
 
-DATABASE_URL = f"mysql+pymysql://{config['database']['username']}:{config['database']['password']}@{config['database']['host']}/{config['database']['database']}"
+config = load_config()
+database_config = config.get('database', {})
 
+# "url" in the database section overrides the MySQL settings with any SQLAlchemy URL
+MYSQL_SETTINGS = ('username', 'password', 'host', 'database')
 
+def database_url():
+    if database_config.get('url'):
+        return database_config['url']
+    missing = [f"database.{key}" for key in MYSQL_SETTINGS if key not in database_config]
+    if missing:
+        raise RuntimeError(
+            "No database configured: set database.url in config.json, or the MySQL settings "
+            f"(missing {', '.join(missing)})"
+        )
+    return f"mysql+pymysql://{database_config['username']}:{database_config['password']}@{database_config['host']}/{database_config['database']}"
 
-# Create database engine
-engine = create_engine(DATABASE_URL)
+# Async drivers used when "async" is enabled in config.json
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-# Create a session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connection pool settings, overridable through the "pool" section of config.json
+POOL_DEFAULTS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,  # below MySQL's default wait_timeout
+}
+POOL_OPTIONS = {**POOL_DEFAULTS, **database_config.get('pool', {})}
+# Only understood by QueuePool; SQLite's in-memory pools (SingletonThreadPool, StaticPool) reject them
+QUEUE_POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout")
+
+ASYNC_MODE = bool(database_config.get('async', False))
+
+# Read replicas: "replicas.urls" lists SQLAlchemy URLs of servers replicating the primary.
+# Reads through get_read_db() are spread over the healthy ones and fall back to the primary.
+replicas_config = database_config.get('replicas', {})
+REPLICA_URLS = replicas_config.get('urls', [])
+REPLICA_CHECK_SECONDS = replicas_config.get('check_seconds', 10)
+# Reads go to the primary for this long after a client's write (read-your-writes)
+STICKY_SECONDS = replicas_config.get('sticky_seconds', 5)
+
+# Statements at least this slow are kept as samples on /metrics
+SLOW_QUERY_MS = config.get('metrics', {}).get('slow_query_ms', 100)
+
+# Engines, built by init_engine()
+engine = None
+async_engine = None
+replica_set = replicas.ReplicaSet(max_lag_seconds=replicas_config.get('max_lag_seconds'))
+
+# Session factories, bound to the engines by init_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+# Objects must stay readable after commit, there is no lazy IO outside the session
+AsyncSessionLocal = sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+_engine_lock = threading.Lock()
+
+# create_engine arguments for url: the dialect's own pool class, timed under `name`, with the
+# pool options it accepts
+def _pool_arguments(url, name: str):
+    pool_class = url.get_dialect().get_pool_class(url)
+    options = POOL_OPTIONS
+    if not issubclass(pool_class, QueuePool):
+        options = {key: value for key, value in POOL_OPTIONS.items() if key not in QUEUE_POOL_OPTIONS}
+    return {"poolclass": metrics.timed_pool(pool_class, name), **options}
+
+def _async_url(url):
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+# Build the engines and bind the session factories; safe to call more than once
+def init_engine():
+    global engine, async_engine
+    with _engine_lock:
+        if engine is not None:
+            return engine
+        url = make_url(database_url())
+        primary = create_engine(url, **_pool_arguments(url, "primary"))
+        metrics.instrument_engine(primary, "primary", SLOW_QUERY_MS)
+        SessionLocal.configure(bind=primary)
+        if ASYNC_MODE:
+            async_url = _async_url(url)
+            async_engine = create_async_engine(async_url, **_pool_arguments(async_url, "async"))
+            metrics.instrument_engine(async_engine.sync_engine, "async", SLOW_QUERY_MS)
+            AsyncSessionLocal.configure(bind=async_engine)
+        for number, replica_url in enumerate(REPLICA_URLS, 1):
+            replica_set.add(_build_replica(f"replica{number}", make_url(replica_url)))
+        engine = primary
+        return engine
+
+def _build_replica(name: str, url):
+    replica_engine = create_engine(url, **_pool_arguments(url, name))
+    metrics.instrument_engine(replica_engine, name, SLOW_QUERY_MS)
+    replica_async_engine = None
+    if ASYNC_MODE:
+        async_url = _async_url(url)
+        replica_async_engine = create_async_engine(async_url, **_pool_arguments(async_url, name + "_async"))
+        metrics.instrument_engine(replica_async_engine.sync_engine, name + "_async", SLOW_QUERY_MS)
+    return replicas.Replica(name, replica_engine, replica_async_engine)
+
+def get_engine():
+    return engine if engine is not None else init_engine()
+
+# Open up to `connections` pooled connections ahead of the first requests (one for pools
+# that keep a single connection, such as SQLite in memory)
+def warm_up_pool(connections: int):
+    bind = get_engine()
+    pool_size = bind.pool.size() if isinstance(bind.pool, QueuePool) else 1
+    opened = []
+    try:
+        for _ in range(min(connections, pool_size)):
+            connection = bind.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+async def dispose_engines():
+    for replica in replica_set.replicas:
+        if replica.async_engine is not None:
+            await replica.async_engine.dispose()
+        replica.engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
 
 # Base class for models
 Base = declarative_base()
@@ -25,4 +159,114 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Session for the async endpoints: an AsyncSession in async mode, a blocking Session otherwise.
+# Always go through run_sync() so the same crud function works with both.
+async def get_async_db():
+    if ASYNC_MODE:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+# A healthy replica for the current request, None to read from the primary
+def _read_replica():
+    if replicas.reading_from_primary():
+        return None
+    return replica_set.pick()
+
+# Whether a session reads from a replica rather than the primary
+def is_replica(db):
+    bind = db.sync_session.get_bind() if isinstance(db, AsyncSession) else db.get_bind()
+    return any(bind in (replica.engine, getattr(replica.async_engine, "sync_engine", None))
+               for replica in replica_set.replicas)
+
+# Read-only counterparts of get_db() and get_async_db(), for endpoints that never write.
+# Each session is bound to one replica, or to the primary when none is healthy or the
+# client wrote within the last STICKY_SECONDS.
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    if ASYNC_MODE:
+        replica = _read_replica()
+        async with (AsyncSessionLocal(bind=replica.async_engine) if replica else AsyncSessionLocal()) as db:
+            yield db
+    else:
+        db = read_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+# Session on a replica, or the primary, outside a dependency (exports, index rebuilds);
+# the caller closes it
+def read_session():
+    replica = _read_replica()
+    return SessionLocal(bind=replica.engine) if replica else SessionLocal()
+
+# Run a crud function (which takes a Session as first argument) without blocking the event loop
+async def run_sync(db, fn, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# Close a session from get_async_db early, returning its connection to the pool
+# (for long-lived responses such as event streams)
+async def release(db):
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+# INSERT ... ON DUPLICATE KEY / ON CONFLICT for a batch of rows in one statement.
+# With increment=True the update_columns are added to the existing values instead of replacing them.
+def upsert(db, table, rows, index_elements, update_columns, increment: bool = False):
+    if not rows:
+        return
+    from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        statement = mysql.insert(table)
+        new = statement.inserted
+    else:
+        statement = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+        new = statement.excluded
+    values = {column: (table.c[column] + new[column]) if increment else new[column] for column in update_columns}
+    if dialect == "mysql":
+        statement = statement.on_duplicate_key_update(**values)
+    else:
+        statement = statement.on_conflict_do_update(index_elements=index_elements, set_=values)
+    db.execute(statement, rows)
+
+# UPDATE one row by primary key in a single statement, without loading it first. `where`
+# adds conditions (the update only happens if they hold). With `returning` columns, their
+# values after the update come back as a row: through UPDATE ... RETURNING where the dialect
+# has it (SQLite, PostgreSQL), from rowcount and a SELECT by primary key otherwise (MySQL).
+# Without, returns True. None when no row matched.
+# On MySQL, "matched" relies on rowcount counting matched rows, which needs the FOUND_ROWS
+# client flag. SQLAlchemy's MySQL dialects set it by default. Without it, rowcount counts
+# changed rows only, and an update that leaves the row as it was reads as no match.
+def update_row(db, model, row_id, values: dict, returning=(), where=()):
+    primary_key = model.__mapper__.primary_key[0]
+    statement = (
+        update(model).where(primary_key == row_id, *where).values(values)
+        .execution_options(synchronize_session=False)
+    )
+    if returning and db.get_bind().dialect.update_returning:
+        return db.execute(statement.returning(*returning)).first()
+    if db.execute(statement).rowcount == 0:
+        return None
+    if not returning:
+        return True
+    return db.execute(select(*returning).where(primary_key == row_id)).first()
@@ -0,0 +1,48 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import crud, models
+from dispatch import READY_STATUS
+from pagination import DEFAULT_PAGE_SIZE
+
+# The query behind each hot endpoint, with sample parameters; EXPLAIN only plans them
+HOT_QUERIES = {
+    "login": lambda db: db.query(models.User).filter(models.User.username == "sample"),
+    "customers.view_menu": lambda db: db.query(models.Menu).filter(models.Menu.restaurant_owner_id == 1),
+    "customers.view_order_history": lambda db: crud._order_list_query(db)
+        .filter(models.Order.customer_id == 1).order_by(models.Order.id.desc()),
+    "restaurant_owners.add_menu_item": lambda db: db.query(models.RestaurantOwner)
+        .filter(models.RestaurantOwner.user_id == 1),
+    "restaurant_owners.view_orders": lambda db: crud._order_list_query(db)
+        .filter(models.Order.restaurant_owner_id == 1, models.Order.status == "pending").order_by(models.Order.id),
+    "delivery_personnel.view_available_deliveries": lambda db: crud._delivery_list_query(db, 1),
+    "admins.get_orders": lambda db: crud._order_list_query(db)
+        .filter(models.Order.status == "pending").order_by(models.Order.id),
+    "dispatch.ready_orders": lambda db: db.query(models.Order.id, models.Order.restaurant_owner_id)
+        .outerjoin(models.Delivery, models.Delivery.order_id == models.Order.id)
+        .filter(models.Order.status == READY_STATUS, models.Delivery.id == None),
+}
+
+# Tables read in full according to one EXPLAIN output
+def _full_scans(dialect: str, plan: list):
+    if dialect == "mysql":
+        return [row["table"] for row in plan if row.get("type") == "ALL"]
+    if dialect == "sqlite":
+        # "SCAN orders" reads the table, "SCAN orders USING INDEX ..." walks an index
+        return [row["detail"].split()[1] for row in plan
+                if row["detail"].startswith("SCAN ") and " USING " not in row["detail"]]
+    if dialect == "postgresql":
+        return [line.split(" on ")[1].split()[0] for line in (row["QUERY PLAN"] for row in plan)
+                if "Seq Scan on " in line]
+    return []
+
+# EXPLAIN every hot query; full_scans names the tables each one reads without an index
+def explain_hot_queries(db: Session):
+    dialect = db.get_bind().dialect
+    explain = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    results = []
+    for name, build in HOT_QUERIES.items():
+        statement = build(db).limit(DEFAULT_PAGE_SIZE + 1).statement
+        sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        plan = [dict(row) for row in db.execute(text(explain + sql)).mappings()]
+        results.append({"name": name, "statement": sql, "full_scans": _full_scans(dialect.name, plan), "plan": plan})
+    return results
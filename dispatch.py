@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import threading
+import time
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import models
+import counters
+import events
+from database import config, SessionLocal
+from geo import GridIndex, match_nearest
+
+logger = logging.getLogger(__name__)
+
+dispatch_config = config.get('dispatch', {})
+
+READY_STATUS = "ready for delivery"  # order status set by the restaurant when food can be picked up
+ASSIGNED_STATUS = "assigned"  # status of deliveries created by the dispatcher
+
+# Matches ready orders to the nearest available courier. Available couriers and restaurant
+# locations live in memory, couriers in a GridIndex; the write paths that change them call
+# courier_changed()/restaurant_changed(), and a full reload every reload_seconds picks up
+# changes made by other workers. Dispatchers may run at once on several workers (the
+# background job and the admin endpoint): ready orders are claimed with SKIP LOCKED, and a
+# courier is only assigned if it is still available in the database when it is claimed.
+class Dispatcher:
+    def __init__(self, cell_size: float = 0.01, max_km: float = 10.0, batch_size: int = 500,
+                 reload_seconds: float = 300):
+        self.max_km = max_km
+        self.batch_size = batch_size
+        self.reload_seconds = reload_seconds
+        self.couriers = GridIndex(cell_size)
+        self.restaurants = {}  # restaurant_owner_id -> (latitude, longitude)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+
+    def load(self, db: Session):
+        couriers = GridIndex(self.couriers.cell_size)
+        rows = db.query(models.DeliveryPersonnel.id, models.DeliveryPersonnel.latitude,
+                        models.DeliveryPersonnel.longitude) \
+            .filter(models.DeliveryPersonnel.is_available == True,
+                    models.DeliveryPersonnel.latitude != None, models.DeliveryPersonnel.longitude != None)
+        for courier_id, latitude, longitude in rows:
+            couriers.upsert(courier_id, latitude, longitude)
+        restaurants = {restaurant_id: (latitude, longitude) for restaurant_id, latitude, longitude in
+                       db.query(models.RestaurantOwner.id, models.RestaurantOwner.latitude,
+                                models.RestaurantOwner.longitude)
+                       .filter(models.RestaurantOwner.latitude != None, models.RestaurantOwner.longitude != None)}
+        with self._lock:
+            self.couriers, self.restaurants = couriers, restaurants
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_seconds:
+            self.load(db)
+
+    def courier_changed(self, courier_id: int, available: bool, latitude: float = None, longitude: float = None):
+        with self._lock:
+            if available and latitude is not None and longitude is not None:
+                self.couriers.upsert(courier_id, latitude, longitude)
+            elif not available:
+                self.couriers.remove(courier_id)
+
+    # Position ping: moves a courier that is indexed as available, others are left out
+    def courier_moved(self, courier_id: int, latitude: float, longitude: float):
+        with self._lock:
+            if courier_id in self.couriers:
+                self.couriers.upsert(courier_id, latitude, longitude)
+
+    def restaurant_changed(self, restaurant_id: int, latitude: float = None, longitude: float = None):
+        with self._lock:
+            if latitude is not None and longitude is not None:
+                self.restaurants[restaurant_id] = (latitude, longitude)
+
+    # Mark the couriers unavailable, only those still available in the database; returns the
+    # ids claimed. Another dispatcher may have assigned a courier since this worker's index
+    # was loaded.
+    def _claim_couriers(self, db: Session, courier_ids):
+        courier_id = models.DeliveryPersonnel.id
+        available = (courier_id.in_(courier_ids), models.DeliveryPersonnel.is_available == True)
+        if db.get_bind().dialect.update_returning:
+            return set(db.execute(
+                update(models.DeliveryPersonnel).where(*available).values(is_available=False)
+                .returning(courier_id).execution_options(synchronize_session=False)
+            ).scalars())
+        # MySQL: the locking read waits for a concurrent claim to commit and sees its result
+        claimed = set(db.execute(select(courier_id).where(*available).with_for_update()).scalars())
+        if claimed:
+            db.execute(update(models.DeliveryPersonnel).where(courier_id.in_(claimed))
+                       .values(is_available=False).execution_options(synchronize_session=False))
+        return claimed
+
+    # Assign one batch of ready orders; returns the assignments made
+    def dispatch(self, db: Session):
+        self.ensure_loaded(db)
+        orders = db.query(models.Order.id, models.Order.restaurant_owner_id) \
+            .outerjoin(models.Delivery, models.Delivery.order_id == models.Order.id) \
+            .filter(models.Order.status == READY_STATUS, models.Delivery.id == None) \
+            .order_by(models.Order.id).limit(self.batch_size) \
+            .with_for_update(skip_locked=True, of=models.Order).all()
+        with self._lock:
+            pickups = [(order.id, *self.restaurants[order.restaurant_owner_id])
+                       for order in orders if order.restaurant_owner_id in self.restaurants]
+        matches = []
+        try:
+            # A match whose courier was taken meanwhile is dropped and its order matched
+            # again, against the couriers left in the index
+            while pickups:
+                with self._lock:
+                    found = match_nearest(self.couriers, pickups, self.max_km)
+                if not found:
+                    break
+                claimed = self._claim_couriers(db, [courier_id for _, courier_id, _ in found])
+                matches.extend(match for match in found if match[1] in claimed)
+                lost = {order_id for order_id, courier_id, _ in found if courier_id not in claimed}
+                pickups = [pickup for pickup in pickups if pickup[0] in lost]
+            if not matches:
+                db.rollback()
+                return []
+            deliveries = [models.Delivery(order_id=order_id, delivery_personnel_id=courier_id, status=ASSIGNED_STATUS)
+                          for order_id, courier_id, _ in matches]
+            db.add_all(deliveries)
+            db.flush()
+            counters.bump(db, counters.TOTAL_DELIVERIES, len(matches))
+            assignments = [{"order_id": order_id, "delivery_id": delivery.id, "delivery_personnel_id": courier_id,
+                            "distance_km": round(km, 3)}
+                           for (order_id, courier_id, km), delivery in zip(matches, deliveries)]
+            db.commit()
+            for assignment in assignments:
+                events.delivery_status_changed(assignment["order_id"], assignment["delivery_id"], ASSIGNED_STATUS,
+                                               assignment["delivery_personnel_id"])
+        except Exception:
+            db.rollback()
+            # Matched couriers were taken out of the index, rebuild it on the next run
+            self._loaded_at = None
+            raise
+        return assignments
+
+dispatcher = Dispatcher(
+    cell_size=dispatch_config.get('cell_size', 0.01),
+    max_km=dispatch_config.get('max_km', 10.0),
+    batch_size=dispatch_config.get('batch_size', 500),
+    reload_seconds=dispatch_config.get('reload_seconds', 300),
+)
+
+def _dispatch_once():
+    db = SessionLocal()
+    try:
+        return dispatcher.dispatch(db)
+    finally:
+        db.close()
+
+# Background job, started with the app when dispatch.interval_seconds is set
+async def dispatch_periodically(interval: float):
+    while True:
+        try:
+            assignments = await run_in_threadpool(_dispatch_once)
+            if assignments:
+                logger.info("Dispatched %d orders", len(assignments))
+        except Exception:
+            logger.exception("Dispatch run failed")
+        await asyncio.sleep(interval)
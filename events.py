@@ -0,0 +1,69 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from database import config
+
+events_config = config.get('events', {})
+
+# Statuses after which an order stream ends
+TERMINAL_ORDER_STATUSES = {"delivered", "canceled", "cancelled"}
+
+def order_topic(order_id: int):
+    return f"order:{order_id}"
+
+# In-process pub/sub. Subscribers are asyncio queues owned by the event loop that created
+# them; publish() may be called from any thread (sync endpoints run in the threadpool).
+# Each subscriber queue is bounded and drops its oldest event when a client falls behind.
+class Broker:
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)  # topic -> {(loop, queue)}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[topic].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is None:
+                return
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def has_subscribers(self, topic: str = None):
+        with self._lock:
+            return bool(self._subscribers.get(topic) if topic else self._subscribers)
+
+    def publish(self, topic: str, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop is closed, its stream is gone
+                self.unsubscribe(topic, queue)
+
+def _offer(queue: asyncio.Queue, event: dict):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+broker = Broker(queue_size=events_config.get('queue_size', 16))
+
+# Called by the write paths after their commit
+def order_status_changed(order_id: int, status: str):
+    broker.publish(order_topic(order_id), {"type": "order", "order_id": order_id, "status": status})
+
+def delivery_status_changed(order_id: int, delivery_id: int, status: str, delivery_personnel_id: int = None):
+    broker.publish(order_topic(order_id), {"type": "delivery", "order_id": order_id, "delivery_id": delivery_id,
+                                           "status": status, "delivery_personnel_id": delivery_personnel_id})
+
+def format_sse(event: dict):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
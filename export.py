@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+import crud
+from database import config, read_session
+
+export_config = config.get('export', {})
+BATCH_SIZE = export_config.get('batch_size', 1000)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Formatters turn a row iterator into text chunks of roughly batch_size rows each
+def ndjson_chunks(names, rows, batch_size):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(names, row)), default=str))
+        if len(chunk) >= batch_size:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+def csv_chunks(names, rows, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    yield buffer.getvalue()
+
+FORMATTERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+}
+
+# Body of a StreamingResponse. Owns its session because the response outlives the
+# request's get_db dependency.
+def stream_report(report_type: str, export_format: str, batch_size: int = BATCH_SIZE):
+    names = [column.key for column in crud.REPORT_COLUMNS[report_type]]
+    db = read_session()
+    try:
+        rows = crud.stream_report_rows(report_type, db, batch_size)
+        yield from FORMATTERS[export_format](names, rows, batch_size)
+    finally:
+        db.close()
@@ -0,0 +1,86 @@
+import math
+from collections import defaultdict
+
+KM_PER_DEGREE = 111.32
+
+# Equirectangular approximation, accurate enough at city scale
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float):
+    x = (lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = lat2 - lat1
+    return math.hypot(x, y) * KM_PER_DEGREE
+
+# Points bucketed into square lat/lon cells. nearest() scans rings of cells outward from
+# the query cell and stops once no unvisited cell can hold a closer point.
+class GridIndex:
+    def __init__(self, cell_size: float = 0.01):
+        self.cell_size = cell_size  # degrees, 0.01 is roughly 1 km
+        self._cells = defaultdict(dict)  # (row, col) -> {key: (lat, lon)}
+        self._points = {}  # key -> cell
+
+    def _cell(self, lat: float, lon: float):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def upsert(self, key, lat: float, lon: float):
+        self.remove(key)
+        cell = self._cell(lat, lon)
+        self._cells[cell][key] = (lat, lon)
+        self._points[key] = cell
+
+    def remove(self, key):
+        cell = self._points.pop(key, None)
+        if cell is not None:
+            points = self._cells[cell]
+            del points[key]
+            if not points:
+                del self._cells[cell]
+
+    def _ring(self, center, radius: int):
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for offset in range(-radius, radius + 1):
+            yield (row - radius, col + offset)
+            yield (row + radius, col + offset)
+        for offset in range(-radius + 1, radius):
+            yield (row + offset, col - radius)
+            yield (row + offset, col + radius)
+
+    # Returns (key, distance_km) of the closest point within max_km, or None
+    def nearest(self, lat: float, lon: float, max_km: float = 10.0):
+        if not self._points:
+            return None
+        center = self._cell(lat, lon)
+        # A cell r rings away is at least (r - 1) cells from the query point, and a degree of
+        # longitude shrinks with cos(lat)
+        cell_km = self.cell_size * KM_PER_DEGREE * math.cos(math.radians(min(abs(lat), 89.0)))
+        best_key, best_km = None, max_km
+        radius = 0
+        while (radius - 1) * cell_km <= best_km:
+            for cell in self._ring(center, radius):
+                for key, (point_lat, point_lon) in self._cells.get(cell, {}).items():
+                    km = distance_km(lat, lon, point_lat, point_lon)
+                    if km <= best_km and (best_key is None or km < best_km or key < best_key):
+                        best_key, best_km = key, km
+            radius += 1
+        return (best_key, best_km) if best_key is not None else None
+
+# Greedily give each pickup, in order, the nearest free point of the index. Matched points
+# are removed from the index. pickups are (pickup_key, lat, lon); returns
+# [(pickup_key, point_key, distance_km)] for the pickups that found one.
+def match_nearest(index: GridIndex, pickups, max_km: float = 10.0):
+    matches = []
+    for pickup_key, lat, lon in pickups:
+        found = index.nearest(lat, lon, max_km)
+        if found is None:
+            continue
+        point_key, km = found
+        index.remove(point_key)
+        matches.append((pickup_key, point_key, km))
+    return matches
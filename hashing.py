@@ -0,0 +1,101 @@
+import asyncio
+import hmac
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Password hashing runs in worker processes so bcrypt never holds the event loop or the GIL.
+# This module is imported by every worker, keep its imports to the standard library; passlib
+# is only loaded inside the worker processes.
+
+_context = None
+
+def make_context(rounds: int):
+    from passlib.context import CryptContext
+
+    # min = max = default, so any hash made with another cost factor is flagged for rehash
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds,
+                        bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+
+def _init_worker(rounds: int):
+    global _context
+    _context = make_context(rounds)
+
+def _hash(password: str):
+    return _context.hash(password)
+
+# Returns (valid, new_hash); new_hash is set when the stored value should be replaced,
+# either because its parameters are outdated or because it is a legacy plaintext password
+def _verify_and_update(password: str, stored: str):
+    if not stored:
+        return False, None
+    if _context.identify(stored, required=False) is None:
+        if hmac.compare_digest(password.encode(), stored.encode()):
+            return True, _context.hash(password)
+        return False, None
+    return _context.verify_and_update(password, stored)
+
+# Raised when more hashing jobs are queued than the pool accepts
+class PoolSaturated(Exception):
+    pass
+
+# Bounded process pool for bcrypt. At most max_pending jobs are queued or running,
+# further submissions fail immediately with PoolSaturated instead of piling up.
+class HashPool:
+    def __init__(self, rounds: int = 12, workers: int = None, max_pending: int = None):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=(self.rounds,)
+                )
+            return self._executor
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn, *args):
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PoolSaturated()
+            self._pending += 1
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    @property
+    def pending(self):
+        return self._pending
+
+    # Blocking variants, for code already running in a threadpool
+    def hash(self, password: str):
+        return self.submit(_hash, password).result()
+
+    def verify_and_update(self, password: str, stored: str):
+        return self.submit(_verify_and_update, password, stored).result()
+
+    # Awaitable variants, for async endpoints
+    async def hash_async(self, password: str):
+        return await asyncio.wrap_future(self.submit(_hash, password))
+
+    async def verify_and_update_async(self, password: str, stored: str):
+        return await asyncio.wrap_future(self.submit(_verify_and_update, password, stored))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,182 @@
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from database import config
+
+# Opening hours as written by restaurant owners ("Mon-Fri 09:00-22:00; Sat-Sun 10:00-23:30",
+# "9am to 9pm weekdays") parsed into weekly intervals: (opens, closes) in minutes since
+# Monday 00:00, closes exclusive, sorted and merged. Times are local to hours.timezone (UTC
+# by default).
+
+hours_config = config.get('hours', {})
+TIMEZONE = ZoneInfo(hours_config.get('timezone', 'UTC'))
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+ALWAYS_OPEN = ("24/7", "24x7", "always open", "open 24/7", "open 24 hours")
+DAY_GROUPS = {
+    "daily": range(7), "every day": range(7), "everyday": range(7), "all week": range(7),
+    "weekdays": range(5), "weekday": range(5), "weekends": range(5, 7), "weekend": range(5, 7),
+}
+
+_TIME = r"(\d{1,2})(?:[:.](\d{2}))?\s*(?:([ap])\.?m\b\.?)?"
+_RANGE = rf"{_TIME}\s*(?:-|–|to)\s*{_TIME}"
+_RANGE_RE = re.compile(_RANGE, re.IGNORECASE)
+_ALL_DAY = r"\b(?:24 ?h(?:ou)?rs?|24h|all day)\b"
+# The times of a clause in order: a range, all day, or closed
+_TIMES_RE = re.compile(rf"(?P<range>{_RANGE})|(?P<all_day>{_ALL_DAY})|(?P<closed>\bclosed\b)")
+# Words around the days and times that carry no meaning ("Mon-Fri from 9 to 5", "open daily")
+_FILLER_RE = re.compile(r"\b(?:from|open|opening|hours|only)\b|:")
+_DAY_RANGE_RE = re.compile(r"^([a-z]+)\.?\s*(?:-|–|to)\s*([a-z]+)\.?$")
+
+# Any prefix of two letters or more: "Mo", "Tue", "Thurs", "Sunday"
+def _day(name: str, text: str):
+    for index, day in enumerate(DAYS):
+        if len(name) >= 2 and day.startswith(name):
+            return index
+    raise ValueError(f"unknown day {name!r} in {text!r}")
+
+# The days named in the text between two times of a clause, none for separators only
+def _days(part: str, text: str):
+    days = []
+    for item in re.split(r"\s*(?:,|&|/|\band\b)\s*", part.strip()):
+        item = item.strip().rstrip(".")
+        if not item:
+            continue
+        match = _DAY_RANGE_RE.match(item)
+        if match:
+            first, last = _day(match.group(1), text), _day(match.group(2), text)
+            days.extend((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+        elif item in DAY_GROUPS:
+            days.extend(DAY_GROUPS[item])
+        else:
+            days.extend(_day(word.rstrip("."), text) for word in item.split())
+    return days
+
+def _minute(hour: str, minute: str, meridiem: str, text: str):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"invalid time in {text!r}")
+        hour = hour % 12 + (12 if meridiem.lower() == "p" else 0)
+    if minute > 59 or hour > 24 or (hour == 24 and minute):
+        raise ValueError(f"invalid time in {text!r}")
+    return hour * 60 + minute
+
+# (opens, closes) in minutes since midnight of one range; closes after 24:00 when open past
+# midnight. A closing hour without am/pm that would come before the opening one on a 12-hour
+# clock is read as pm ("9-5" is 9:00-17:00); otherwise, as with "22:00-02:00" or "8pm-2am",
+# the range runs past midnight. A range that opens and closes at the same time is refused.
+def _range(match, text: str):
+    opens = _minute(*match.group(1, 2, 3), text)
+    close_hour, close_minute, close_meridiem = match.group(4, 5, 6)
+    closes = _minute(close_hour, close_minute, close_meridiem, text)
+    if closes < opens and not close_meridiem and 1 <= int(close_hour) <= 12 and closes + 12 * 60 > opens:
+        closes += 12 * 60
+    if closes == opens:
+        raise ValueError(f"{match.group()!r} opens and closes at the same time in {text!r}")
+    if closes < opens:
+        closes += MINUTES_PER_DAY  # past midnight
+    return opens, closes
+
+# The days of a clause, each group with the times next to it: (days, ranges), ranges None
+# for closed. Times follow their days ("Mon-Fri 9-17, Sat 10-14") or come before them
+# ("9am to 9pm weekdays"), whichever the group starts with. A group without days is every day.
+def _clause(clause: str, text: str):
+    lowered = clause.lower()
+    parts = []  # ("days", days) and ("times", [range or None for closed]) in order
+    end = 0
+    for match in _TIMES_RE.finditer(lowered):
+        parts.append(("days", _days_between(lowered[end:match.start()], clause, text)))
+        if match.group("range"):
+            times = _range(_RANGE_RE.fullmatch(match.group()), text)
+        else:
+            times = (0, MINUTES_PER_DAY) if match.group("all_day") else None
+        parts.append(("times", [times]))
+        end = match.end()
+    parts.append(("days", _days_between(lowered[end:], clause, text)))
+    groups = []
+    for kind, values in parts:
+        if not values:
+            continue
+        # a group is done once it has both, at the next part of the kind it started with
+        if not groups or kind == groups[-1]["first"] and groups[-1]["days"] and groups[-1]["times"]:
+            groups.append({"first": kind, "days": [], "times": []})
+        groups[-1][kind].extend(values)
+    if not groups:
+        raise ValueError(f"no times in {clause.strip()!r}")
+    clauses = []
+    for group in groups:
+        if not group["times"]:
+            raise ValueError(f"no times for the days in {clause.strip()!r}")
+        if None in group["times"] and len(group["times"]) > 1:
+            raise ValueError(f"both closed and open in {clause.strip()!r}")
+        ranges = None if None in group["times"] else group["times"]
+        clauses.append((group["days"] or list(range(7)), ranges))
+    return clauses
+
+# The days in the text between two times of a clause
+def _days_between(part: str, clause: str, text: str):
+    part = _FILLER_RE.sub(" ", part)
+    if re.search(r"\d", part):
+        raise ValueError(f"cannot read the times in {clause.strip()!r}")
+    return _days(part, text)
+
+def merge(intervals):
+    merged = []
+    for opens, closes in sorted(intervals):
+        if merged and opens <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], closes))
+        else:
+            merged.append((opens, closes))
+    return merged
+
+# Clauses are separated by ";" or new lines and read in order: open times add to the days
+# they name, and "closed" removes the times given so far for its days ("Mon-Sun 10-22; Mon
+# closed"). A range past midnight belongs to the day it opens. Raises ValueError for text
+# that cannot be read.
+def parse(text: str):
+    if text is None or not text.strip():
+        raise ValueError("opening hours are empty")
+    if text.strip().lower() in ALWAYS_OPEN:
+        return [(0, MINUTES_PER_WEEK)]
+    ranges_by_day = {day: [] for day in range(7)}
+    for clause in re.split(r"[;\n]+", text):
+        if not clause.strip():
+            continue
+        for days, ranges in _clause(clause, text):
+            for day in days:
+                if ranges is None:
+                    ranges_by_day[day] = []
+                else:
+                    ranges_by_day[day].extend(ranges)
+    intervals = []
+    for day, ranges in ranges_by_day.items():
+        for opens, closes in ranges:
+            opens, closes = day * MINUTES_PER_DAY + opens, day * MINUTES_PER_DAY + closes
+            if closes > MINUTES_PER_WEEK:  # Sunday night into Monday
+                intervals.append((0, closes - MINUTES_PER_WEEK))
+                closes = MINUTES_PER_WEEK
+            intervals.append((opens, closes))
+    return merge(intervals)
+
+# The intervals cut at midnight, as stored in restaurant_hours: no interval is longer than a
+# day, so the intervals open at a given minute all open in the day before it
+def split_days(intervals):
+    pieces = []
+    for opens, closes in intervals:
+        while opens < closes:
+            midnight = (opens // MINUTES_PER_DAY + 1) * MINUTES_PER_DAY
+            pieces.append((opens, min(closes, midnight)))
+            opens = midnight
+    return pieces
+
+# Minute of the week of at (now when None) in the restaurants' time zone; a naive datetime
+# is taken to be local time already
+def minute_of_week(at: datetime = None):
+    if at is None:
+        at = datetime.now(TIMEZONE)
+    elif at.tzinfo is not None:
+        at = at.astimezone(TIMEZONE)
+    return at.weekday() * MINUTES_PER_DAY + at.hour * 60 + at.minute
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import bindparam, or_, update
+from starlette.concurrency import run_in_threadpool
+import models
+from database import config, SessionLocal
+from dispatch import dispatcher
+
+logger = logging.getLogger(__name__)
+
+locations_config = config.get('locations', {})
+FLUSH_SECONDS = locations_config.get('flush_seconds', 1.0)
+
+# Latest reported position of each courier, latest wins. Pings only touch memory: the
+# positions waiting to be written are flushed in batches by flush(), one executemany UPDATE
+# per batch_size couriers, however many pings arrived in between. Positions are kept per
+# worker process, for at most max_couriers couriers (least recently reported dropped first).
+# With several workers a courier's pings may land in different ones: each write carries the
+# time of the ping and never replaces a newer stored position, so the newest one stays.
+class LocationBuffer:
+    def __init__(self, max_couriers: int = 100000, batch_size: int = 1000):
+        self.max_couriers = max_couriers
+        self.batch_size = batch_size
+        self._latest = OrderedDict()  # courier_id -> (latitude, longitude, reported_at)
+        self._pending = {}  # courier_id -> (latitude, longitude, reported_at), not yet written
+        self._lock = threading.Lock()
+        self.pings = 0
+        self.flushed = 0
+
+    def record(self, courier_id: int, latitude: float, longitude: float, reported_at: float = None):
+        with self._lock:
+            # Stamped under the lock, so that a later ping always has the later time
+            position = (latitude, longitude, reported_at or time.time())
+            self.pings += 1
+            latest = self._latest
+            latest[courier_id] = position
+            latest.move_to_end(courier_id)
+            if len(latest) > self.max_couriers:
+                dropped, _ = latest.popitem(last=False)
+                if self._pending.pop(dropped, None) is not None:
+                    logger.warning("Courier %s evicted from the location buffer before its position was written",
+                                   dropped)
+            self._pending[courier_id] = position
+        dispatcher.courier_moved(courier_id, latitude, longitude)
+
+    # A position written to the database by another path (availability updates): served from
+    # memory, and any older ping buffered here is no longer written. Older pings buffered by
+    # other workers are not written over it either, its stored time is newer.
+    def remember(self, courier_id: int, latitude: float, longitude: float):
+        with self._lock:
+            self._latest[courier_id] = (latitude, longitude, time.time())
+            self._latest.move_to_end(courier_id)
+            self._pending.pop(courier_id, None)
+
+    # (latitude, longitude, reported_at), or None when this worker has no position
+    def get(self, courier_id: int):
+        with self._lock:
+            return self._latest.get(courier_id)
+
+    # {courier_id: (latitude, longitude, reported_at)} reported at most max_age seconds ago
+    def positions(self, courier_ids=None, max_age: float = None):
+        oldest = time.time() - max_age if max_age is not None else 0
+        with self._lock:
+            if courier_ids is None:
+                items = list(self._latest.items())
+            else:
+                items = [(courier_id, self._latest[courier_id]) for courier_id in courier_ids
+                         if courier_id in self._latest]
+        return {courier_id: position for courier_id, position in items if position[2] >= oldest}
+
+    def pending(self):
+        return len(self._pending)
+
+    # Write the buffered positions; returns how many couriers were updated. On failure the
+    # positions go back to the buffer unless a newer ping arrived meanwhile.
+    def flush(self, db):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [{"courier_id": courier_id, "new_latitude": latitude, "new_longitude": longitude,
+                 "new_reported_at": datetime.utcfromtimestamp(reported_at)}
+                for courier_id, (latitude, longitude, reported_at) in pending.items()]
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                # One executemany per batch; ids without a courier row, or whose stored position
+                # is newer, simply match nothing
+                db.connection().execute(_UPDATE_POSITION, rows[start:start + self.batch_size])
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for courier_id, position in pending.items():
+                    self._pending.setdefault(courier_id, position)
+            raise
+        self.flushed += len(rows)
+        return len(rows)
+
+_couriers = models.DeliveryPersonnel.__table__
+_UPDATE_POSITION = (
+    update(_couriers)
+    .where(_couriers.c.id == bindparam("courier_id"),
+           or_(_couriers.c.location_reported_at == None, _couriers.c.location_reported_at <= bindparam("new_reported_at")))
+    .values(latitude=bindparam("new_latitude"), longitude=bindparam("new_longitude"),
+            location_reported_at=bindparam("new_reported_at"))
+)
+
+location_buffer = LocationBuffer(
+    max_couriers=locations_config.get('max_couriers', 100000),
+    batch_size=locations_config.get('batch_size', 1000),
+)
+
+def flush_once():
+    db = SessionLocal()
+    try:
+        return location_buffer.flush(db)
+    finally:
+        db.close()
+
+# Background job, started with the app
+async def flush_periodically(interval: float = FLUSH_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(flush_once)
+        except Exception:
+            logger.exception("Courier location flush failed")
+
+# Positions received since the last flush, written when the app stops
+async def flush_remaining():
+    try:
+        await run_in_threadpool(flush_once)
+    except Exception:
+        logger.exception("Final courier location flush failed, %d positions not written", location_buffer.pending())
@@ -1,12 +1,54 @@
-from fastapi import FastAPI
-from routers import customers, restaurant_owners, delivery_personnel, admins
-from database import engine
-import models
-models.Base.metadata.create_all(bind=engine)
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from starlette.concurrency import run_in_threadpool
+from routers import customers, restaurant_owners, delivery_personnel, admins, login
+import database
+import counters
+import dispatch
+import locations
+import auth
+import metrics
+import migrations
+import replicas
 from fastapi.middleware.cors import CORSMiddleware
 
+# "startup" section of config.json: run migrations (on by default; turn off and run
+# `python -m migrations` on deploy when many workers start at once) and open some pooled
+# connections before serving
+startup_config = database.config.get('startup', {})
+
+# Background jobs, references kept so the tasks are not garbage collected
+background_tasks = []
+
+# Importing this module has no side effects; the database is first touched here
+@asynccontextmanager
+async def lifespan(app):
+    engine = database.init_engine()
+    if startup_config.get('migrate', True):
+        await run_in_threadpool(migrations.upgrade, engine)
+    if startup_config.get('warm_up_connections'):
+        await run_in_threadpool(database.warm_up_pool, startup_config['warm_up_connections'])
+    if database.replica_set.replicas:
+        background_tasks.append(asyncio.create_task(
+            database.replica_set.check_periodically(database.REPLICA_CHECK_SECONDS)))
+    background_tasks.append(asyncio.create_task(counters.reconcile_periodically()))
+    background_tasks.append(asyncio.create_task(locations.flush_periodically()))
+    if dispatch.dispatch_config.get('interval_seconds'):
+        background_tasks.append(asyncio.create_task(
+            dispatch.dispatch_periodically(dispatch.dispatch_config['interval_seconds'])))
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        background_tasks.clear()
+        await locations.flush_remaining()
+        auth.hash_pool.shutdown()
+        await database.dispose_engines()
+
 origins = ["*"]
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -14,9 +56,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if database.REPLICA_URLS:
+    app.add_middleware(replicas.ReadYourWritesMiddleware, sticky_seconds=database.STICKY_SECONDS)
+app.add_middleware(metrics.MetricsMiddleware)
 #app = FastAPI()
 
+app.include_router(login.router, tags=["login"])
 app.include_router(customers.router, prefix="/customers", tags=["customers"])
 app.include_router(restaurant_owners.router, prefix="/restaurant_owners", tags=["restaurant_owners"])
 app.include_router(delivery_personnel.router, prefix="/delivery_personnel", tags=["delivery_personnel"])
-app.include_router(admins.router, prefix="/admins", tags=["admins"])
\ No newline at end of file
+app.include_router(admins.router, prefix="/admins", tags=["admins"])
+
+# Prometheus scrape endpoint, per worker process
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
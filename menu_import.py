@@ -0,0 +1,92 @@
+import codecs
+import csv
+import json
+
+# Parsers for menu import bodies that read the request stream as it arrives: rows are
+# yielded as soon as they are complete, so the body is never held in memory whole. Both
+# raise ValueError for a body that cannot be parsed.
+
+# Text of the request body, decoded as it arrives (a UTF-8 byte order mark is dropped)
+async def _text(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+# Rows of a CSV body as dicts keyed by its header, like csv.DictReader. A record ends at a
+# line break outside quotes, so quoted fields may span lines.
+async def csv_rows(chunks):
+    header = None
+    pending = ""
+    record = ""
+
+    def parse(record):
+        try:
+            return next(csv.reader([record]), [])
+        except csv.Error as error:
+            raise ValueError(str(error))
+
+    async for text in _text(chunks):
+        pending += text
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            record += line + "\n"
+            if record.count('"') % 2:
+                continue
+            values, record = parse(record), ""
+            if not values:
+                continue
+            if header is None:
+                header = values
+            else:
+                yield dict(zip(header, values))
+    record += pending
+    if record.strip() and header is not None:
+        if record.count('"') % 2:
+            raise ValueError("unterminated quoted field")
+        values = parse(record)
+        if values:
+            yield dict(zip(header, values))
+
+# Items of a JSON array body, each decoded as soon as it is complete
+async def json_rows(chunks):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = finished = False
+    async for text in _text(chunks):
+        buffer = buffer[position:] + text
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                if buffer[position] == "," and not started:
+                    raise ValueError("expected a JSON array")
+                position += 1
+            if position == len(buffer):
+                break
+            if finished:
+                raise ValueError("data after the JSON array")
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                finished = True
+                position += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # incomplete, wait for more of the body
+            if end == len(buffer) and not isinstance(item, (dict, list)):
+                break  # a number or literal may go on in the next chunk
+            yield item
+            position = end
+    if not finished:
+        raise ValueError("incomplete JSON array")
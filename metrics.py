@@ -0,0 +1,238 @@
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from sqlalchemy import event, exc
+
+# Request latency buckets in seconds, Prometheus histogram style
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Number of slow statements kept for /metrics, oldest dropped first
+SLOW_QUERY_SAMPLES = 50
+
+# SQL statements and time spent in the database by the request being handled. The
+# middleware sets it; the engine hooks add to it from whichever thread runs the query,
+# since the threadpool and AsyncSession.run_sync both carry the request's context along.
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+
+_current = ContextVar("request_stats", default=None)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+# Strip literal values from a statement so samples never carry user data; bound
+# parameters are already placeholders and their values are never recorded
+def redact(statement: str):
+    statement = _STRING_RE.sub("?", statement)
+    statement = _NUMBER_RE.sub("?", statement)
+    statement = _IN_LIST_RE.sub("(...)", statement)
+    return " ".join(statement.split())
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+# Process-wide metrics; every worker process keeps and serves its own
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(Histogram)  # (method, route) -> request latency
+        self.requests = defaultdict(int)  # (method, route, status) -> requests
+        self.route_queries = defaultdict(int)  # (method, route) -> statements
+        self.route_db_seconds = defaultdict(float)  # (method, route) -> time in the database
+        self.slow_queries = deque(maxlen=SLOW_QUERY_SAMPLES)  # (timestamp, route, seconds, statement)
+        self.slow_query_count = 0
+        self.checkouts = defaultdict(int)  # pool -> connections checked out
+        self.pool_wait = defaultdict(Histogram)  # pool -> time waiting for a connection
+        self.pool_timeouts = defaultdict(int)  # pool -> checkouts that gave up after pool_timeout
+        self.engines = {}  # pool name -> engine, for the pool gauges
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            self.latency[key].observe(seconds)
+            self.requests[(method, route, status)] += 1
+            self.route_queries[key] += stats.queries
+            self.route_db_seconds[key] += stats.db_seconds
+
+    def observe_query(self, statement: str, seconds: float, slow_seconds: float):
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += seconds
+        if seconds >= slow_seconds:
+            sample = (time.time(), _route(stats.scope) if stats else None, seconds, redact(statement))
+            with self._lock:
+                self.slow_queries.append(sample)
+                self.slow_query_count += 1
+
+    def observe_checkout(self, pool: str):
+        with self._lock:
+            self.checkouts[pool] += 1
+
+    def observe_pool_wait(self, pool: str, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.pool_wait[pool].observe(seconds)
+            if timed_out:
+                self.pool_timeouts[pool] += 1
+
+registry = Registry()
+
+# Time statements on an engine (a sync Engine, use async_engine.sync_engine for the async one)
+def instrument_engine(engine, name: str, slow_query_ms: float = 100):
+    slow_seconds = slow_query_ms / 1000.0
+    registry.engines[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            registry.observe_query(statement, time.perf_counter() - started, slow_seconds)
+
+    @event.listens_for(engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        registry.observe_checkout(name)
+
+_timed_pools = {}
+
+# Subclass of a pool class that records how long each checkout waited for a connection
+# (including opening a new one within max_overflow); pass as create_engine(poolclass=...)
+def timed_pool(pool_class, name: str):
+    key = (pool_class, name)
+    if key not in _timed_pools:
+        class TimedPool(pool_class):
+            def _do_get(self):
+                started = time.perf_counter()
+                try:
+                    connection = super()._do_get()
+                except exc.TimeoutError:
+                    registry.observe_pool_wait(name, time.perf_counter() - started, timed_out=True)
+                    raise
+                registry.observe_pool_wait(name, time.perf_counter() - started)
+                return connection
+        TimedPool.__name__ = "Timed" + pool_class.__name__
+        _timed_pools[key] = TimedPool
+    return _timed_pools[key]
+
+# ASGI middleware recording latency, status and database use per route template
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            registry.observe_request(scope["method"], _route(scope), status, time.perf_counter() - started, stats)
+
+# Route template such as /customers/order/{order_id}, so ids do not become labels
+def _route(scope):
+    # Newer FastAPI keeps included routers as they are, the prefixed path is on the route context
+    route = (scope.get("fastapi") or {}).get("effective_route_context") or scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def _labels(**labels):
+    return "{" + ",".join('%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " "))
+                          for key, value in labels.items()) + "}"
+
+def _histogram(lines, name: str, histogram: Histogram, **labels):
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.total}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+# Prometheus text exposition format
+def render():
+    lines = []
+    with registry._lock:
+        lines += ["# HELP http_request_duration_seconds Request latency by route template.",
+                  "# TYPE http_request_duration_seconds histogram"]
+        for (method, route), histogram in sorted(registry.latency.items()):
+            _histogram(lines, "http_request_duration_seconds", histogram, method=method, route=route)
+        lines += ["# HELP http_requests_total Requests by route template and status.",
+                  "# TYPE http_requests_total counter"]
+        for (method, route, status), count in sorted(registry.requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines += ["# HELP db_queries_total SQL statements executed, by route template.",
+                  "# TYPE db_queries_total counter"]
+        for (method, route), count in sorted(registry.route_queries.items()):
+            lines.append(f"db_queries_total{_labels(method=method, route=route)} {count}")
+        lines += ["# HELP db_query_seconds_total Time spent executing SQL, by route template.",
+                  "# TYPE db_query_seconds_total counter"]
+        for (method, route), seconds in sorted(registry.route_db_seconds.items()):
+            lines.append(f"db_query_seconds_total{_labels(method=method, route=route)} {seconds}")
+        lines += ["# HELP db_slow_queries_total Statements slower than metrics.slow_query_ms.",
+                  "# TYPE db_slow_queries_total counter",
+                  f"db_slow_queries_total {registry.slow_query_count}",
+                  "# HELP db_slow_query_seconds Most recent slow statements, literals redacted.",
+                  "# TYPE db_slow_query_seconds gauge"]
+        for timestamp, route, seconds, statement in registry.slow_queries:
+            lines.append(f"db_slow_query_seconds{_labels(route=route or 'background', statement=statement)} "
+                         f"{seconds} {int(timestamp * 1000)}")
+        lines += ["# HELP db_pool_checkouts_total Connections checked out of the pool.",
+                  "# TYPE db_pool_checkouts_total counter"]
+        for pool, count in sorted(registry.checkouts.items()):
+            lines.append(f"db_pool_checkouts_total{_labels(pool=pool)} {count}")
+        lines += ["# HELP db_pool_wait_seconds Time a checkout waited for a connection.",
+                  "# TYPE db_pool_wait_seconds histogram"]
+        for pool, histogram in sorted(registry.pool_wait.items()):
+            _histogram(lines, "db_pool_wait_seconds", histogram, pool=pool)
+        lines += ["# HELP db_pool_timeouts_total Checkouts that failed after pool_timeout.",
+                  "# TYPE db_pool_timeouts_total counter"]
+        for pool, count in sorted(registry.pool_timeouts.items()):
+            lines.append(f"db_pool_timeouts_total{_labels(pool=pool)} {count}")
+        engines = sorted(registry.engines.items())
+    for gauge, help_text, method in (
+        ("db_pool_size", "Configured pool size.", "size"),
+        ("db_pool_checked_out", "Connections currently in use.", "checkedout"),
+        ("db_pool_overflow", "Connections open beyond pool_size.", "overflow"),
+    ):
+        lines += [f"# HELP {gauge} {help_text}", f"# TYPE {gauge} gauge"]
+        for name, engine in engines:
+            value = getattr(engine.pool, method, None)
+            if value is not None:
+                lines.append(f"{gauge}{_labels(pool=name)} {value()}")
+    return "\n".join(lines) + "\n"
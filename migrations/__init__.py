@@ -0,0 +1,69 @@
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+# Versioned schema migrations. Each module named m<version>_<name>.py defines
+# upgrade(connection); upgrade() below applies the ones not yet recorded in the
+# schema_version table, in version order. Migrations must be idempotent: MySQL commits
+# DDL implicitly, so a migration interrupted halfway is simply run again.
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MODULE_RE = re.compile(r"^m(\d+)_(\w+)$")
+
+# Serializes workers starting at the same time against one MySQL server
+LOCK_NAME = "food_delivery_migrations"
+LOCK_TIMEOUT_SECONDS = 60
+
+def available():
+    found = []
+    for module in pkgutil.iter_modules(__path__):
+        match = MODULE_RE.match(module.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2), module.name))
+    return sorted(found)
+
+def applied(connection):
+    if not inspect(connection).has_table(schema_version.name):
+        return set()
+    return set(connection.execute(select(schema_version.c.version)).scalars())
+
+def pending(engine):
+    with engine.connect() as connection:
+        done = applied(connection)
+    return [(version, name) for version, name, _ in available() if version not in done]
+
+# Bring the database up to the latest version, returns the versions applied
+def upgrade(engine):
+    ran = []
+    with engine.connect() as lock_connection:
+        mysql = engine.dialect.name == "mysql"
+        if mysql:
+            got_lock = lock_connection.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"), {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT_SECONDS}
+            ).scalar()
+            if got_lock != 1:
+                raise RuntimeError("Timed out waiting for another process to finish migrating")
+        try:
+            with engine.begin() as connection:
+                schema_version.create(connection, checkfirst=True)
+            for version, name, module_name in available():
+                with engine.begin() as connection:
+                    if version in applied(connection):
+                        continue
+                    importlib.import_module(f"{__name__}.{module_name}").upgrade(connection)
+                    connection.execute(schema_version.insert().values(
+                        version=version, name=name, applied_at=datetime.utcnow()
+                    ))
+                ran.append(version)
+        finally:
+            if mysql:
+                lock_connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+    return ran
@@ -0,0 +1,18 @@
+# Apply pending migrations to the database from config.json:
+#
+#   python -m migrations           apply everything pending
+#   python -m migrations --status  list pending migrations only
+import argparse
+import migrations
+from database import get_engine
+
+parser = argparse.ArgumentParser(prog="python -m migrations", description="Apply pending schema migrations")
+parser.add_argument("--status", action="store_true", help="only list pending migrations")
+args = parser.parse_args()
+
+if args.status:
+    for version, name in migrations.pending(get_engine()):
+        print(f"pending  {version:04d} {name}")
+else:
+    for version in migrations.upgrade(get_engine()):
+        print(f"applied  {version:04d}")
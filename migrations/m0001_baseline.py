@@ -0,0 +1,113 @@
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+                        UniqueConstraint)
+
+# The schema as it stood when migrations were introduced, frozen here rather than read from
+# models.py: a new database gets these tables and every later migration then runs on it, as
+# it does on an upgraded one. Existing tables are left alone, later migrations bring them up
+# to date.
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(255), unique=True, index=True),
+    Column("password", String(255)),
+    Column("role", String(255)),
+    Column("active", Boolean),
+)
+
+Table(
+    "customers", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255)),
+    Column("delivery_address", String(255)),
+    Column("payment_details", String(255)),
+    Column("user_id", Integer, ForeignKey("users.id"), index=True),
+)
+
+Table(
+    "restaurant_owners", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("restaurant_name", String(255)),
+    Column("address", String(255)),
+    Column("hours_of_operation", String(255)),
+    Column("latitude", Float, nullable=True),
+    Column("longitude", Float, nullable=True),
+    Column("user_id", Integer, ForeignKey("users.id"), index=True),
+)
+
+Table(
+    "delivery_personnel", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255)),
+    Column("contact_details", String(255)),
+    Column("vehicle_type", String(255)),
+    Column("user_id", Integer, ForeignKey("users.id"), index=True),
+    Column("is_available", Boolean),
+    Column("latitude", Float, nullable=True),
+    Column("longitude", Float, nullable=True),
+)
+
+Table(
+    "orders", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("customer_id", Integer, ForeignKey("customers.id")),
+    Column("restaurant_owner_id", Integer, ForeignKey("restaurant_owners.id")),
+    Column("status", String(50)),
+    Column("total_amount", Integer),
+    Column("created_at", DateTime),
+    Index("ix_orders_customer_id", "customer_id"),
+    Index("ix_orders_restaurant_status", "restaurant_owner_id", "status"),
+    Index("ix_orders_status", "status"),
+)
+
+Table(
+    "menus", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("restaurant_owner_id", Integer, ForeignKey("restaurant_owners.id")),
+    Column("name", String(255)),
+    Column("description", String(255)),
+    Column("price", Integer),
+    Column("availability", Boolean),
+    UniqueConstraint("restaurant_owner_id", "name", name="uq_menus_restaurant_name"),
+    Index("ix_menus_restaurant_availability", "restaurant_owner_id", "availability"),
+)
+
+Table(
+    "order_items", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("order_id", Integer, ForeignKey("orders.id"), index=True),
+    Column("menu_id", Integer, ForeignKey("menus.id")),
+    Column("quantity", Integer),
+    Column("unit_price", Integer),
+)
+
+Table(
+    "deliveries", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("order_id", Integer, ForeignKey("orders.id")),
+    Column("delivery_personnel_id", Integer, ForeignKey("delivery_personnel.id")),
+    Column("status", String(50)),
+    Column("delivery_time", Integer),
+    Index("ix_deliveries_courier_status", "delivery_personnel_id", "status"),
+    Index("ix_deliveries_order_id", "order_id"),
+)
+
+Table(
+    "activity_counters", metadata,
+    Column("name", String(50), primary_key=True),
+    Column("shard", Integer, primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+
+Table(
+    "order_rollups", metadata,
+    Column("granularity", String(10), primary_key=True),
+    Column("bucket_start", DateTime, primary_key=True),
+    Column("restaurant_owner_id", Integer, primary_key=True),
+    Column("status", String(50), primary_key=True),
+    Column("order_count", Integer, nullable=False),
+)
+
+def upgrade(connection):
+    metadata.create_all(bind=connection, checkfirst=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+import models
+
+# Columns added to tables that databases created before them already have
+COLUMNS = [
+    ("orders", "created_at"),
+    ("restaurant_owners", "latitude"),
+    ("restaurant_owners", "longitude"),
+    ("delivery_personnel", "latitude"),
+    ("delivery_personnel", "longitude"),
+]
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    for table_name, column_name in COLUMNS:
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        if column_name in existing:
+            continue
+        column = models.Base.metadata.tables[table_name].c[column_name]
+        spec = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {spec}"))
@@ -0,0 +1,62 @@
+import logging
+from sqlalchemy import Index, MetaData, Table, and_, func, inspect, select, update
+
+logger = logging.getLogger(__name__)
+
+# (table, index name, columns, unique) for the filters used by the list and lookup endpoints
+INDEXES = [
+    ("customers", "ix_customers_user_id", ("user_id",), False),
+    ("restaurant_owners", "ix_restaurant_owners_user_id", ("user_id",), False),
+    ("delivery_personnel", "ix_delivery_personnel_user_id", ("user_id",), False),
+    ("orders", "ix_orders_customer_id", ("customer_id",), False),
+    ("orders", "ix_orders_restaurant_status", ("restaurant_owner_id", "status"), False),
+    ("orders", "ix_orders_status", ("status",), False),
+    ("deliveries", "ix_deliveries_courier_status", ("delivery_personnel_id", "status"), False),
+    ("deliveries", "ix_deliveries_order_id", ("order_id",), False),
+    ("menus", "ix_menus_restaurant_availability", ("restaurant_owner_id", "availability"), False),
+    ("menus", "uq_menus_restaurant_name", ("restaurant_owner_id", "name"), True),
+]
+
+def _existing(inspector, table_name):
+    indexes = {index["name"]: tuple(index["column_names"]) for index in inspector.get_indexes(table_name)}
+    for constraint in inspector.get_unique_constraints(table_name):
+        indexes[constraint["name"]] = tuple(constraint["column_names"])
+    return indexes
+
+# Menus sharing a restaurant and name would fail uq_menus_restaurant_name. The oldest keeps
+# its name and the others are renamed "<name> #<id>"; none are deleted, since order items
+# refer to them. Names are compared as the database compares them (its collation), as the
+# unique index will.
+def _rename_duplicate_menus(connection):
+    menus = Table("menus", MetaData(), autoload_with=connection)
+    groups = (
+        select(menus.c.restaurant_owner_id, menus.c.name, func.min(menus.c.id).label("keep"))
+        .where(menus.c.name.is_not(None))
+        .group_by(menus.c.restaurant_owner_id, menus.c.name)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    duplicates = connection.execute(
+        select(menus.c.id, menus.c.name)
+        .join(groups, and_(menus.c.restaurant_owner_id == groups.c.restaurant_owner_id, menus.c.name == groups.c.name))
+        .where(menus.c.id != groups.c.keep)
+    ).all()
+    length = menus.c.name.type.length or 255
+    for menu_id, name in duplicates:
+        suffix = f" #{menu_id}"
+        connection.execute(update(menus).where(menus.c.id == menu_id).values(name=name[:length - len(suffix)] + suffix))
+    if duplicates:
+        logger.warning("Renamed %d menu items that repeated a name within their restaurant", len(duplicates))
+
+# An index is skipped when one with the same name or the same columns exists already,
+# such as the index MySQL creates for a foreign key
+def upgrade(connection):
+    inspector = inspect(connection)
+    for table_name, name, columns, unique in INDEXES:
+        existing = _existing(inspector, table_name)
+        if name in existing or columns in existing.values():
+            continue
+        if name == "uq_menus_restaurant_name":
+            _rename_duplicate_menus(connection)
+        table = Table(table_name, MetaData(), autoload_with=connection)
+        Index(name, *(table.c[column] for column in columns), unique=unique).create(connection)
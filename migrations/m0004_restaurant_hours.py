@@ -0,0 +1,32 @@
+import logging
+from sqlalchemy import insert, select
+import hours
+import models
+
+logger = logging.getLogger(__name__)
+
+# Weekly intervals parsed from the hours_of_operation text of existing restaurants.
+# Restaurants that already have intervals are skipped, so the backfill can run again;
+# text that hours.parse cannot read is left as it is and gets intervals on the next update.
+def upgrade(connection):
+    models.RestaurantHours.__table__.create(connection, checkfirst=True)
+    owners = models.RestaurantOwner.__table__
+    parsed = select(models.RestaurantHours.restaurant_owner_id)
+    unreadable = 0
+    rows = []
+    for restaurant_owner_id, text in connection.execute(
+        select(owners.c.id, owners.c.hours_of_operation).where(owners.c.id.not_in(parsed))
+    ):
+        try:
+            intervals = hours.parse(text)
+        except ValueError as error:
+            logger.warning("Restaurant %s left without intervals, cannot read its opening hours: %s",
+                           restaurant_owner_id, error)
+            unreadable += 1
+            continue
+        rows.extend({"restaurant_owner_id": restaurant_owner_id, "opens_at": opens, "closes_at": closes}
+                    for opens, closes in hours.split_days(intervals))
+    if rows:
+        connection.execute(insert(models.RestaurantHours.__table__), rows)
+    if unreadable:
+        logger.warning("%d restaurants have opening hours that cannot be read", unreadable)
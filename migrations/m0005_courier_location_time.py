@@ -0,0 +1,13 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+import models
+
+# Time of each courier's stored position: buffered location flushes from several workers
+# only write a position newer than the one stored
+def upgrade(connection):
+    existing = {column["name"] for column in inspect(connection).get_columns("delivery_personnel")}
+    if "location_reported_at" in existing:
+        return
+    column = models.Base.metadata.tables["delivery_personnel"].c["location_reported_at"]
+    spec = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE delivery_personnel ADD COLUMN {spec}"))
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Float, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -27,7 +28,7 @@ class Customer(Base):
     name = Column(String(255))
     delivery_address = Column(String(255))
     payment_details = Column(String(255))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
 
     # Relationships
     user = relationship("User", back_populates="customer")
@@ -36,17 +37,37 @@ class Customer(Base):
 # Order Model
 class Order(Base):
     __tablename__ = 'orders'
+    __table_args__ = (
+        Index('ix_orders_customer_id', 'customer_id'),  # order history
+        Index('ix_orders_restaurant_status', 'restaurant_owner_id', 'status'),  # restaurant order lists
+        Index('ix_orders_status', 'status'),  # admin status filter, dispatch of ready orders
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
     restaurant_owner_id = Column(Integer, ForeignKey("restaurant_owners.id"))
     status = Column(String(50))  # e.g., "preparing", "out for delivery", "delivered"
     total_amount = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     customer = relationship("Customer", back_populates="orders")
     restaurant_owner = relationship("RestaurantOwner", back_populates="orders")
     delivery = relationship("Delivery", back_populates="order", uselist=False)
+    items = relationship("OrderItem", back_populates="order")
+
+# Order Item Model - menu items of an order, priced when the order was placed
+class OrderItem(Base):
+    __tablename__ = 'order_items'
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    menu_id = Column(Integer, ForeignKey("menus.id"))
+    quantity = Column(Integer, default=1)
+    unit_price = Column(Integer)
+
+    # Relationships
+    order = relationship("Order", back_populates="items")
 
 # Restaurant Owner Model
 class RestaurantOwner(Base):
@@ -56,16 +77,34 @@ class RestaurantOwner(Base):
     restaurant_name = Column(String(255))
     address = Column(String(255))
     hours_of_operation = Column(String(255))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    latitude = Column(Float, nullable=True)  # Pickup location used by courier dispatch
+    longitude = Column(Float, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
 
     # Relationships
     user = relationship("User", back_populates="restaurant_owner")
     menus = relationship("Menu", back_populates="restaurant_owner")
     orders = relationship("Order", back_populates="restaurant_owner")
 
+# Restaurant Hours Model - hours_of_operation parsed by hours.parse, one row per weekly interval
+class RestaurantHours(Base):
+    __tablename__ = 'restaurant_hours'
+    __table_args__ = (
+        Index('ix_restaurant_hours_open', 'opens_at', 'closes_at', 'restaurant_owner_id'),  # open now filter
+    )
+
+    id = Column(Integer, primary_key=True)
+    restaurant_owner_id = Column(Integer, ForeignKey("restaurant_owners.id"), nullable=False, index=True)
+    opens_at = Column(Integer, nullable=False)  # Minutes since Monday 00:00
+    closes_at = Column(Integer, nullable=False)  # Exclusive
+
 # Menu Model
 class Menu(Base):
     __tablename__ = 'menus'
+    __table_args__ = (
+        UniqueConstraint('restaurant_owner_id', 'name', name='uq_menus_restaurant_name'),  # bulk import key
+        Index('ix_menus_restaurant_availability', 'restaurant_owner_id', 'availability'),  # menu pages
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     restaurant_owner_id = Column(Integer, ForeignKey("restaurant_owners.id"))
@@ -80,6 +119,10 @@ class Menu(Base):
 # Delivery Model
 class Delivery(Base):
     __tablename__ = 'deliveries'
+    __table_args__ = (
+        Index('ix_deliveries_courier_status', 'delivery_personnel_id', 'status'),  # courier delivery lists
+        Index('ix_deliveries_order_id', 'order_id'),  # order tracking and events
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"))
@@ -99,9 +142,30 @@ class DeliveryPersonnel(Base):
     name = Column(String(255))
     contact_details = Column(String(255))
     vehicle_type = Column(String(255))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     is_available = Column(Boolean, default=True)
+    latitude = Column(Float, nullable=True)  # Last known position
+    longitude = Column(Float, nullable=True)
+    location_reported_at = Column(DateTime, nullable=True)  # When that position was reported (UTC)
 
     # Relationships
     user = relationship("User", back_populates="delivery_personnel")
-    deliveries = relationship("Delivery", back_populates="delivery_personnel")
\ No newline at end of file
+    deliveries = relationship("Delivery", back_populates="delivery_personnel")
+
+# Activity Counter Model - running totals behind the admin activity dashboard
+class ActivityCounter(Base):
+    __tablename__ = 'activity_counters'
+
+    name = Column(String(50), primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    value = Column(Integer, default=0, nullable=False)
+
+# Order Rollup Model - order counts per restaurant, status and time bucket
+class OrderRollup(Base):
+    __tablename__ = 'order_rollups'
+
+    granularity = Column(String(10), primary_key=True)  # 'hour', 'day' or 'all'
+    bucket_start = Column(DateTime, primary_key=True)
+    restaurant_owner_id = Column(Integer, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    order_count = Column(Integer, default=0, nullable=False)
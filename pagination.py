@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+from typing import Optional
+from fastapi import HTTPException, Query
+from database import config
+
+pagination_config = config.get('pagination', {})
+DEFAULT_PAGE_SIZE = pagination_config.get('default_page_size', 50)
+MAX_PAGE_SIZE = pagination_config.get('max_page_size', 500)
+
+# Cursors are opaque to clients: the id of the last row of the previous page
+def encode_cursor(last_id: int):
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(payload["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Query parameters shared by every list endpoint, use as `page: PageParams = Depends()`
+class PageParams:
+    def __init__(self, cursor: Optional[str] = None,
+                 limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+        self.after_id = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+
+# Apply keyset pagination on id_column to a query, returns (rows, next_cursor)
+def paginate(query, id_column, page: PageParams, descending: bool = False):
+    if page.after_id is not None:
+        query = query.filter(id_column < page.after_id if descending else id_column > page.after_id)
+    query = query.order_by(id_column.desc() if descending else id_column.asc())
+    rows = query.limit(page.limit + 1).all()
+    next_cursor = encode_cursor(rows[page.limit - 1].id) if len(rows) > page.limit else None
+    return rows[:page.limit], next_cursor
@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from http.cookies import CookieError, SimpleCookie
+from sqlalchemy import event, text
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# HTTP methods that never write; any other request that succeeds pins its client to the primary
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+# Cookie holding the time (epoch seconds) until which the client reads from the primary
+STICKY_COOKIE = "read_primary_until"
+
+class Replica:
+    def __init__(self, name: str, engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        # Assumed healthy until a check says otherwise, so scripts that never run checks still use it
+        self.healthy = True
+        self.lag_seconds = None
+        self.checked_at = None
+
+# Round-robin over the replicas that passed their last health check. A replica is taken
+# out when a check fails or one of its connections is lost mid-request, and put back by
+# the next successful check.
+class ReplicaSet:
+    def __init__(self, max_lag_seconds: float = None):
+        self.max_lag_seconds = max_lag_seconds
+        self.replicas = []
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, replica: Replica):
+        self.replicas.append(replica)
+
+        @event.listens_for(replica.engine, "handle_error")
+        def drop_on_disconnect(context):
+            if context.is_disconnect:
+                self._set_health(replica, False, "connection lost")
+
+    def pick(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def _set_health(self, replica: Replica, healthy: bool, reason: str = None):
+        with self._lock:
+            changed, replica.healthy = replica.healthy != healthy, healthy
+        if changed and healthy:
+            logger.warning("Read replica %s is back in rotation", replica.name)
+        elif changed:
+            logger.warning("Read replica %s taken out of rotation: %s", replica.name, reason)
+
+    # Blocking; runs SELECT 1 on every replica, and on MySQL compares the replication
+    # delay with max_lag_seconds when set
+    def check(self):
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                    lag = _replication_lag(connection) if self.max_lag_seconds is not None else None
+            except Exception as error:
+                self._set_health(replica, False, str(error).splitlines()[0] if str(error) else type(error).__name__)
+            else:
+                replica.lag_seconds = lag
+                if lag is not None and lag > self.max_lag_seconds:
+                    self._set_health(replica, False, f"{lag}s behind the primary")
+                else:
+                    self._set_health(replica, True)
+            replica.checked_at = time.time()
+
+    async def check_periodically(self, interval: float):
+        while True:
+            try:
+                await run_in_threadpool(self.check)
+            except Exception:
+                logger.exception("Read replica health check failed")
+            await asyncio.sleep(interval)
+
+# Seconds the replica is behind, None where the server does not report it. A MySQL
+# replica whose replication threads are stopped reports NULL, treated as infinitely late.
+def _replication_lag(connection):
+    if connection.dialect.name != "mysql":
+        return None
+    for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                              ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+        try:
+            row = connection.execute(text(statement)).mappings().first()
+        except Exception:
+            continue  # SHOW REPLICA STATUS needs MySQL 8.0.22
+        if row is None:
+            return None  # not a replica
+        return float("inf") if row[column] is None else row[column]
+    return None
+
+# Set per request by ReadYourWritesMiddleware, read by the read session dependencies
+_read_primary = ContextVar("read_primary", default=False)
+
+def reading_from_primary():
+    return _read_primary.get()
+
+# ASGI middleware for read-your-writes: a successful write sets a cookie that sends the
+# client's reads to the primary for sticky_seconds, long enough for the replicas to catch up
+class ReadYourWritesMiddleware:
+    def __init__(self, app, sticky_seconds: float = 5):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        now = time.time()
+        token = _read_primary.set(_sticky_until(scope) > now)
+        send_response = send
+        if scope["method"] not in SAFE_METHODS:
+            cookie = (f"{STICKY_COOKIE}={now + self.sticky_seconds:.3f}; Max-Age={int(self.sticky_seconds) + 1}; "
+                      "Path=/; HttpOnly; SameSite=Lax").encode()
+
+            async def send_response(message):
+                if message["type"] == "http.response.start" and message["status"] < 400:
+                    message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie)]}
+                await send(message)
+        try:
+            await self.app(scope, receive, send_response)
+        finally:
+            _read_primary.reset(token)
+
+def _sticky_until(scope):
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            cookies = SimpleCookie()
+            try:
+                cookies.load(value.decode("latin-1"))
+                return float(cookies[STICKY_COOKIE].value)
+            except (CookieError, KeyError, ValueError):
+                continue
+    return 0.0
@@ -0,0 +1,116 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import false, func, insert, select, text, update
+from sqlalchemy.orm import Session
+import models
+from database import upsert
+
+# Every order is counted once per granularity: in its hour, in its day and in the all-time bucket
+GRANULARITIES = ("hour", "day", "all")
+ALL_TIME = datetime(1970, 1, 1)
+
+ROLLUP_TABLE = models.OrderRollup.__table__
+ROLLUP_KEY = ("granularity", "bucket_start", "restaurant_owner_id", "status")
+
+def bucket_start(granularity: str, at: datetime):
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ALL_TIME
+
+def _rows(restaurant_owner_id: int, created_at: datetime, status: str, delta: int):
+    granularities = GRANULARITIES if created_at is not None else ("all",)
+    return [{"granularity": granularity, "bucket_start": bucket_start(granularity, created_at),
+             "restaurant_owner_id": restaurant_owner_id, "status": status or "unknown", "order_count": delta}
+            for granularity in granularities]
+
+# Maintenance hooks, run inside the transaction of the order write they count
+def order_created(db: Session, order: models.Order):
+    orders_created(db, [order])
+
+# One upsert for a whole batch of new orders
+def orders_created(db: Session, orders):
+    counts = Counter()
+    for order in orders:
+        for row in _rows(order.restaurant_owner_id, order.created_at, order.status, 1):
+            counts[tuple(row[key] for key in ROLLUP_KEY)] += 1
+    rows = [dict(zip(ROLLUP_KEY, key), order_count=count) for key, count in counts.items()]
+    upsert(db, ROLLUP_TABLE, rows, ROLLUP_KEY, ["order_count"], increment=True)
+
+def order_status_changed(db: Session, order: models.Order, old_status: str, new_status: str):
+    if old_status == new_status:
+        return
+    rows = _rows(order.restaurant_owner_id, order.created_at, old_status, -1) + \
+        _rows(order.restaurant_owner_id, order.created_at, new_status, 1)
+    upsert(db, ROLLUP_TABLE, rows, ROLLUP_KEY, ["order_count"], increment=True)
+
+# Whole days are read from the day buckets, anything else at hour resolution
+def _granularity(start: datetime = None, end: datetime = None):
+    bounds = [bound for bound in (start, end) if bound is not None]
+    if not bounds:
+        return "all"
+    if all(bound == bucket_start("day", bound) for bound in bounds):
+        return "day"
+    return "hour"
+
+# Rollup rows for the buckets that start within [start, end). Bounds inside an hour are
+# rounded to whole hours: orders in a bucket partly before start are left out, those in a
+# bucket starting before end are counted.
+def _bucketed(db: Session, columns, start: datetime = None, end: datetime = None):
+    granularity = _granularity(start, end)
+    query = db.query(*columns).filter(models.OrderRollup.granularity == granularity)
+    if start is not None:
+        query = query.filter(models.OrderRollup.bucket_start >= start)
+    if end is not None:
+        query = query.filter(models.OrderRollup.bucket_start < end)
+    return query
+
+def popular_restaurants(db: Session, start: datetime = None, end: datetime = None, limit: int = 5):
+    order_count = func.sum(models.OrderRollup.order_count).label("order_count")
+    rows = _bucketed(db, (models.OrderRollup.restaurant_owner_id, order_count), start, end) \
+        .group_by(models.OrderRollup.restaurant_owner_id) \
+        .order_by(order_count.desc()).limit(limit).all()
+    names = dict(db.query(models.RestaurantOwner.id, models.RestaurantOwner.restaurant_name)
+                 .filter(models.RestaurantOwner.id.in_([row.restaurant_owner_id for row in rows])))
+    return [{"restaurant_owner_id": row.restaurant_owner_id,
+             "restaurant_name": names.get(row.restaurant_owner_id),
+             "order_count": int(row.order_count)} for row in rows]
+
+def order_trends(db: Session, start: datetime = None, end: datetime = None):
+    order_count = func.sum(models.OrderRollup.order_count).label("order_count")
+    rows = _bucketed(db, (models.OrderRollup.status, order_count), start, end) \
+        .group_by(models.OrderRollup.status).all()
+    return [{"status": row.status, "order_count": int(row.order_count)} for row in rows if row.order_count]
+
+# Holds off every rollup write until the caller's transaction ends. An order write that
+# commits before the lock is taken is in the orders read afterwards. One still in progress
+# then waits at its rollup upsert and adds its increment on top of the rebuilt counts.
+def _lock_rollups(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        db.execute(text(f"LOCK TABLE {ROLLUP_TABLE.name} IN SHARE ROW EXCLUSIVE MODE"))
+    elif dialect == "mysql":
+        # A locking scan of the whole primary key also locks the gaps, so no row is inserted
+        db.execute(select(func.count()).select_from(ROLLUP_TABLE).with_for_update())
+    else:
+        # SQLite: the first write of a transaction takes the database's write lock
+        db.execute(update(ROLLUP_TABLE).where(false()).values(order_count=ROLLUP_TABLE.c.order_count))
+
+# Recompute every rollup from the orders table, for backfills or after manual data fixes.
+# Order writes wait for the rebuild to commit.
+def rebuild(db: Session, batch_size: int = 10000):
+    db.commit()  # the lock must come before the first read of the orders
+    _lock_rollups(db)
+    counts = Counter()
+    orders = db.query(models.Order.restaurant_owner_id, models.Order.status, models.Order.created_at) \
+        .filter(models.Order.restaurant_owner_id != None).yield_per(batch_size)
+    for restaurant_owner_id, status, created_at in orders:
+        for row in _rows(restaurant_owner_id, created_at, status, 1):
+            counts[tuple(row[key] for key in ROLLUP_KEY)] += 1
+    db.query(models.OrderRollup).delete()
+    rows = [dict(zip(ROLLUP_KEY, key), order_count=count) for key, count in counts.items()]
+    for i in range(0, len(rows), batch_size):
+        db.execute(insert(ROLLUP_TABLE), rows[i:i + batch_size])
+    db.commit()
+    return len(rows)
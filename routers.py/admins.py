@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-import crud, schemas, models
-from database import get_db
+from datetime import datetime
+from typing import List, Optional
+import auth, crud, schemas, models, export, rollups, diagnostics
+from dispatch import dispatcher
+from database import get_db, get_read_db
+from pagination import PageParams
+from serialization import FAST_JSON, order_rows, page_response
 
-router = APIRouter()
+# Every admin endpoint requires an admin token
+router = APIRouter(dependencies=[Depends(auth.require_admin)])
 
 # Manage users (create, update, deactivate)
 @router.post("/users/create")
@@ -16,79 +22,79 @@ def create_user(user: schemas.UserUpdate, db: Session = Depends(get_db)):
 
 @router.put("/users/{user_id}")
 def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not existing_user:
+    updated_user = crud.update_user(db, user_id, user)
+    if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return crud.update_user(db, user_id, user)
+    return updated_user
 
 @router.delete("/users/{user_id}")
 def deactivate_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = crud.deactivate_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return crud.deactivate_user(db, user_id)
+    return {"id": user.id, "username": user.username, "role": user.role, "active": user.active}
 
 # View and manage all orders
-@router.get("/orders", response_model=List[schemas.OrderBase])
-def get_orders(db: Session = Depends(get_db)):
-    orders = db.query(models.Order).all()
-    return orders
+@router.get("/orders", response_model=schemas.OrderPage)
+def get_orders(status: Optional[str] = None, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    orders, next_cursor = crud.get_orders(db, page, status)
+    if FAST_JSON:
+        # Same body as the OrderPage response_model, encoded without a model per row
+        return page_response(order_rows, orders, next_cursor)
+    return {"items": orders, "next_cursor": next_cursor}
 
 @router.put("/orders/{order_id}")
 def manage_order(order_id: int, status: str, db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
-    if not order:
+    if not crud.manage_order(db, order_id, status):
         raise HTTPException(status_code=404, detail="Order not found")
-    order.status = status
-    db.commit()
-    db.refresh(order)
     return {"msg": f"Order {order_id} updated to {status}"}
 
+# Assign ready orders to the nearest available couriers (one batch)
+@router.post("/dispatch", response_model=List[schemas.DispatchAssignment])
+def dispatch_orders(db: Session = Depends(get_db)):
+    return dispatcher.dispatch(db)
+
 # Generate reports
 @router.get("/reports/{report_type}", response_model=schemas.Report)
-def generate_report(report_type: str, db: Session = Depends(get_db)):
-    if report_type == "popular_restaurants":
-        data = crud.get_most_popular_restaurants(db)
+def generate_report(report_type: str, page: PageParams = Depends(),
+                    export_format: Optional[str] = Query(None, alias="format", regex="^(ndjson|csv)$"),
+                    start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    db: Session = Depends(get_read_db)):
+    if export_format and report_type in crud.REPORT_COLUMNS:
+        # Full export streamed in constant memory instead of one page
+        return StreamingResponse(
+            export.stream_report(report_type, export_format),
+            media_type=export.MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="{report_type}.{export_format}"'},
+        )
+    elif report_type in crud.REPORT_COLUMNS:
+        # Row exports ("orders", "users") are paginated
+        data, next_cursor = crud.generate_report(report_type, db, page)
+        return schemas.Report(report_type=report_type, data=data, next_cursor=next_cursor)
+    elif report_type == "popular_restaurants":
+        data = crud.get_most_popular_restaurants(db, start, end)
     elif report_type == "average_delivery_time":
-        data = crud.get_average_delivery_time(db)
+        data = [{"avg_delivery_time": crud.get_average_delivery_time(db)}]
     elif report_type == "order_trends":
-        data = crud.get_order_trends(db)
+        data = crud.get_order_trends(db, start, end)
     else:
         raise HTTPException(status_code=400, detail="Invalid report type")
     return schemas.Report(report_type=report_type, data=data)
 
-# Monitor platform activity
-@router.get("/activity", response_model=schemas.ActivityReport)
-def monitor_activity(db: Session = Depends(get_db)):
-    active_users = db.query(models.User).filter(models.User.role != "admin").count()
-    orders_in_progress = db.query(models.Order).filter(models.Order.status != "delivered").count()
-    completed_orders = db.query(models.Order).filter(models.Order.status == "delivered").count()
-    total_deliveries = db.query(models.Delivery).count()
-    return schemas.ActivityReport(
-        active_users=active_users,
-        orders_in_progress=orders_in_progress,
-        completed_orders=completed_orders,
-        total_deliveries=total_deliveries
-    )
+# Recompute the report rollups from the orders table (backfill)
+@router.post("/rollups/rebuild")
+def rebuild_rollups(db: Session = Depends(get_db)):
+    rows = rollups.rebuild(db)
+    return {"msg": "Rollups rebuilt", "rows": rows}
 
-
-# Endpoint to generate and get a report
-@router.get("/reports/{report_type}", response_model=schemas.Report)
-def get_report(report_type: str, db: Session = Depends(get_db)):
-    # Call a function to generate the report data based on the report_type
-    report_data = crud.generate_report(report_type, db)
-    return schemas.Report(report_type=report_type, data=report_data)
-
-
-# Endpoint to get the platform activity report
+# Monitor platform activity
 @router.get("/activity", response_model=schemas.ActivityReport)
-def get_activity_report(db: Session = Depends(get_db)):
-    # Call a function to generate the activity report
+def monitor_activity(db: Session = Depends(get_read_db)):
+    # Served from the running activity counters, see counters.py
     activity_report = crud.generate_activity_report(db)
-    return schemas.ActivityReport(
-        active_users=activity_report['active_users'],
-        total_deliveries=activity_report['total_deliveries'],
-        orders_pending=activity_report['orders_pending'],
-        orders_completed=activity_report['orders_completed'],
-        platform_uptime=activity_report['platform_uptime']
-    )
\ No newline at end of file
+    return schemas.ActivityReport(**activity_report)
+
+# Query plans of the hot endpoint queries, flags the ones that scan a whole table
+@router.get("/diagnostics/explain", response_model=List[schemas.QueryPlan])
+def explain_hot_queries(db: Session = Depends(get_db)):
+    return diagnostics.explain_hot_queries(db)
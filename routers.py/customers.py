@@ -1,11 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-import crud, schemas, models
-from database import get_db
+from typing import List, Optional
+import auth, crud, schemas, models
+from cache import menu_cache, etag_matches
+from search import menu_index
+from serialization import FAST_JSON, JSONBytesResponse, menu_rows, order_rows, restaurant_rows, page_response
+from pagination import PageParams
+from database import get_db, get_async_db, get_read_db, get_async_read_db, run_sync, release, is_replica, STICKY_SECONDS
+import events, hours
 
 router = APIRouter()
 
+# Largest number of orders accepted by one batch placement request
+MAX_ORDER_BATCH = 100
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_HEARTBEAT_SECONDS = events.events_config.get('heartbeat_seconds', 15)
+
 # Register a new customer
 @router.post("/register")
 def register_customer(customer: schemas.CustomerCreate, db: Session = Depends(get_db)):
@@ -15,70 +29,161 @@ def register_customer(customer: schemas.CustomerCreate, db: Session = Depends(ge
 
 # Login an existing customer
 @router.post("/login")
-def login_customer(username: str, password: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if not user or user.password != password:
-        raise HTTPException(status_code=400, detail="Invalid credentials")
-    return {"msg": "Login successful"}
-
-# Browse Restaurants - List all restaurants
-@router.get("/restaurants", response_model=List[schemas.RestaurantOwnerBase])
-def browse_restaurants(db: Session = Depends(get_db)):
-    restaurants = db.query(models.RestaurantOwner).all()
-    return restaurants
+async def login_customer(username: str, password: str, db: Session = Depends(get_async_db)):
+    user = await auth.authenticate_user(db, username, password, role="customer")
+    return {"msg": "Login successful", "access_token": auth.create_user_token(user), "token_type": "bearer"}
+
+# Browse Restaurants - List all restaurants, or those open now (open_now) or at a given
+# time (open_at, in the restaurants' time zone unless it carries an offset)
+@router.get("/restaurants", response_model=schemas.RestaurantPage)
+async def browse_restaurants(page: PageParams = Depends(), open_now: bool = False, open_at: Optional[datetime] = None,
+                             db: Session = Depends(get_async_read_db)):
+    open_minute = hours.minute_of_week(open_at) if open_at or open_now else None
+    restaurants, next_cursor = await run_sync(db, crud.get_restaurants, page, open_minute)
+    if FAST_JSON:
+        return page_response(restaurant_rows, restaurants, next_cursor)
+    return {"items": restaurants, "next_cursor": next_cursor}
 
 # View Menu of a particular restaurant
 @router.get("/restaurants/{restaurant_id}/menu", response_model=List[schemas.MenuBase])
-def view_menu(restaurant_id: int, db: Session = Depends(get_db)):
-    menu = db.query(models.Menu).filter(models.Menu.restaurant_owner_id == restaurant_id).all()
-    if not menu:
-        raise HTTPException(status_code=404, detail="Menu not found")
-    return menu
+async def view_menu(restaurant_id: int, if_none_match: Optional[str] = Header(None),
+                    db: Session = Depends(get_async_read_db)):
+    # Serve from the menu cache; the session only connects on a cache miss
+    cached = menu_cache.get(restaurant_id)
+    if cached is None:
+        generation = menu_cache.generation(restaurant_id)
+        menu = await run_sync(db, crud.get_menu_rows, restaurant_id)
+        if FAST_JSON:
+            items = menu_rows.encode(menu)
+        else:
+            items = [schemas.MenuBase(**row._mapping).dict() for row in menu]
+        if not items:
+            raise HTTPException(status_code=404, detail="Menu not found")
+        # A replica may not have the write that last invalidated this menu yet, keep its copy briefly
+        cached = menu_cache.set(restaurant_id, items, generation,
+                                ttl_seconds=STICKY_SECONDS if is_replica(db) else None)
+    etag, items = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if FAST_JSON:
+        return JSONBytesResponse(items, headers=headers)
+    return JSONResponse(content=items, headers=headers)
 
 # Search menus by item name, cuisine, or vegetarian options
-@router.get("/search-menu")
-def search_menu(query: str, db: Session = Depends(get_db)):
-    results = db.query(models.Menu).filter(models.Menu.name.ilike(f"%{query}%")).all()
+@router.get("/search-menu", response_model=schemas.MenuSearchResults)
+def search_menu(query: str, available_only: bool = True, restaurant_id: Optional[int] = None,
+                page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100),
+                db: Session = Depends(get_read_db)):
+    menu_index.ensure_loaded(db)
+    total, results = menu_index.search(query, available_only=available_only, restaurant_id=restaurant_id,
+                                       offset=(page - 1) * page_size, limit=page_size)
     if not results:
         raise HTTPException(status_code=404, detail="No items found")
-    return results
+    return schemas.MenuSearchResults(total=total, page=page, page_size=page_size, items=results)
 
 # Place an order
 @router.post("/order")
-def place_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
+async def place_order(order: schemas.OrderCreate, db: Session = Depends(get_async_db),
+                      user: schemas.TokenData = Depends(auth.require_customer)):
+    auth.check_owner(user, order.customer_id)
     # Validate the order (e.g., check menu item availability, customer, and restaurant existence)
-    db_order = crud.create_order(db, order)
-    return {"msg": "Order placed successfully", "order_id": db_order.id}
+    try:
+        placement = await run_sync(db, crud.create_order, order)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return {"msg": "Order placed successfully", "order_id": placement.order_id,
+            "total_amount": placement.total_amount}
+
+# Place many orders at once, each order is accepted or rejected on its own
+@router.post("/orders/batch", response_model=List[schemas.OrderPlacement])
+async def place_orders(orders: List[schemas.OrderCreate], db: Session = Depends(get_async_db),
+                       user: schemas.TokenData = Depends(auth.require_customer)):
+    if len(orders) > MAX_ORDER_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ORDER_BATCH} orders per batch")
+    for order in orders:
+        auth.check_owner(user, order.customer_id)
+    return await run_sync(db, crud.create_orders, orders)
 
 # Track an order
 @router.get("/order/{order_id}")
-def track_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+async def track_order(order_id: int, db: Session = Depends(get_async_read_db),
+                      user: schemas.TokenData = Depends(auth.require_customer)):
+    order = await run_sync(db, crud.get_order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    auth.check_owner(user, order.customer_id)
     return {"order_id": order.id, "status": order.status}
 
+# Follow an order as Server-Sent Events: the current status first, then every order and
+# delivery status change as it is published, without further queries
+@router.get("/order/{order_id}/events")
+async def order_events(order_id: int, request: Request, db: Session = Depends(get_async_db),
+                       user: schemas.TokenData = Depends(auth.require_customer)):
+    topic = events.order_topic(order_id)
+    # Subscribe before reading so a change committed in between is not missed
+    queue = events.broker.subscribe(topic)
+    try:
+        order = await run_sync(db, crud.get_order, order_id)
+        await release(db)
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        auth.check_owner(user, order.customer_id)
+    except BaseException:
+        events.broker.unsubscribe(topic, queue)
+        raise
+    current = {"type": "order", "order_id": order.id, "status": order.status}
+    return StreamingResponse(_order_event_stream(request, topic, queue, current), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _order_event_stream(request: Request, topic: str, queue: asyncio.Queue, current: dict):
+    try:
+        event = current
+        yield events.format_sse(event)
+        while not (event["type"] == "order" and event["status"] in events.TERMINAL_ORDER_STATUSES):
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield events.format_sse(event)
+    finally:
+        events.broker.unsubscribe(topic, queue)
+
 # View past orders and reorder
-@router.get("/order-history", response_model=List[schemas.OrderBase])
-def view_order_history(customer_id: int, db: Session = Depends(get_db)):
-    orders = db.query(models.Order).filter(models.Order.customer_id == customer_id).all()
-    if not orders:
+@router.get("/order-history", response_model=schemas.OrderPage)
+def view_order_history(customer_id: int, status: Optional[str] = None, page: PageParams = Depends(),
+                       db: Session = Depends(get_db), user: schemas.TokenData = Depends(auth.require_customer)):
+    auth.check_owner(user, customer_id)
+    orders, next_cursor = crud.get_customer_orders(db, customer_id, page, status)
+    if not orders and page.after_id is None:
         raise HTTPException(status_code=404, detail="No past orders found")
-    return orders
+    if FAST_JSON:
+        return page_response(order_rows, orders, next_cursor)
+    return {"items": orders, "next_cursor": next_cursor}
 
 # Reorder from the same restaurant
 @router.post("/reorder/{order_id}")
-def reorder(order_id: int, db: Session = Depends(get_db)):
+def reorder(order_id: int, db: Session = Depends(get_db), user: schemas.TokenData = Depends(auth.require_customer)):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    auth.check_owner(user, order.customer_id)
     
-    # Create a new order based on the previous order details
+    items = crud.get_order_items(db, order_id)
+    if not items:
+        raise HTTPException(status_code=400, detail="Order has no items to reorder")
+
+    # Create a new order with the same items, priced at today's menu prices
     new_order = schemas.OrderCreate(
         customer_id=order.customer_id,
         restaurant_owner_id=order.restaurant_owner_id,
-        status="pending",
-        total_amount=order.total_amount
+        items=[schemas.OrderItemCreate(menu_id=item.menu_id, quantity=item.quantity) for item in items]
     )
-    db_order = crud.create_order(db, new_order)
-    return {"msg": "Order reordered successfully", "order_id": db_order.id}
\ No newline at end of file
+    try:
+        placement = crud.create_order(db, new_order)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return {"msg": "Order reordered successfully", "order_id": placement.order_id}
\ No newline at end of file
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
-import crud, schemas, models
-from database import get_db
+from typing import List, Optional
+import auth, crud, schemas
+from database import get_db, get_async_db, get_async_read_db, run_sync
+from dispatch import dispatcher
+from locations import location_buffer
+from pagination import PageParams
 
 router = APIRouter()
 
@@ -14,51 +18,105 @@ def register_delivery_personnel(delivery_personnel: schemas.DeliveryPersonnelCre
 
 # Login for delivery personnel
 @router.post("/login")
-def login_delivery_personnel(username: str, password: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if not user or user.password != password:
-        raise HTTPException(status_code=400, detail="Invalid credentials")
-    return {"msg": "Login successful"}
+async def login_delivery_personnel(username: str, password: str, db: Session = Depends(get_async_db)):
+    user = await auth.authenticate_user(db, username, password, role="delivery_personnel")
+    return {"msg": "Login successful", "access_token": auth.create_user_token(user), "token_type": "bearer"}
 
 # View available deliveries for delivery personnel
-@router.get("/deliveries", response_model=List[schemas.DeliveryBase])
-def view_available_deliveries(db: Session = Depends(get_db), delivery_personnel_id: int = None):
-    deliveries = db.query(models.Delivery).filter(models.Delivery.delivery_personnel_id == delivery_personnel_id, models.Delivery.status == "available").all()
-    if not deliveries:
+@router.get("/deliveries", response_model=schemas.DeliveryPage)
+def view_available_deliveries(db: Session = Depends(get_db), delivery_personnel_id: int = None,
+                              page: PageParams = Depends(),
+                              user: schemas.TokenData = Depends(auth.require_delivery_personnel)):
+    if delivery_personnel_id is not None:
+        auth.check_owner(user, delivery_personnel_id)
+    deliveries, next_cursor = crud.get_deliveries(db, delivery_personnel_id, page)
+    if not deliveries and page.after_id is None:
         raise HTTPException(status_code=404, detail="No available deliveries found")
-    return deliveries
+    return {"items": deliveries, "next_cursor": next_cursor}
 
-# Accept a delivery
+# Accept a delivery for the calling courier; admins name the courier with delivery_personnel_id
 @router.put("/deliveries/{delivery_id}")
-def accept_delivery(delivery_id: int, db: Session = Depends(get_db)):
-    delivery = db.query(models.Delivery).filter(models.Delivery.id == delivery_id).first()
-    if not delivery or delivery.status != "available":
+def accept_delivery(delivery_id: int, delivery_personnel_id: Optional[int] = None, db: Session = Depends(get_db),
+                    user: schemas.TokenData = Depends(auth.require_delivery_personnel)):
+    if delivery_personnel_id is not None:
+        auth.check_owner(user, delivery_personnel_id)
+    courier_id = auth.owned_id(user)
+    if courier_id is None:
+        if delivery_personnel_id is None:
+            raise HTTPException(status_code=400, detail="delivery_personnel_id is required")
+        courier_id = delivery_personnel_id
+    if not crud.claim_delivery(db, delivery_id, courier_id):
         raise HTTPException(status_code=404, detail="Delivery not available")
-    delivery.status = "picked up"
-    db.commit()
-    db.refresh(delivery)
-    return {"msg": "Delivery accepted", "status": delivery.status}
+    return {"msg": "Delivery accepted", "status": "picked up"}
 
 # Track delivery status (e.g., picked up, en route, delivered)
 @router.put("/deliveries/status/{delivery_id}")
-def update_delivery_status(delivery_id: int, status: str, db: Session = Depends(get_db)):
-    delivery = db.query(models.Delivery).filter(models.Delivery.id == delivery_id).first()
+def update_delivery_status(delivery_id: int, status: str, db: Session = Depends(get_db),
+                           user: schemas.TokenData = Depends(auth.require_delivery_personnel)):
+    try:
+        delivery = crud.update_delivery_status(db, delivery_id, status, auth.owned_id(user))
+    except crud.NotOwner:
+        raise auth.not_owner()
     if not delivery:
         raise HTTPException(status_code=404, detail="Delivery not found")
-    delivery.status = status
-    db.commit()
-    db.refresh(delivery)
     return {"msg": "Delivery status updated", "status": delivery.status}
 
 # Manage delivery availability (set availability for delivery personnel)
 @router.put("/availability/{delivery_personnel_id}")
-def set_delivery_availability(delivery_personnel_id: int, availability: schemas.DeliveryAvailability, db: Session = Depends(get_db)):
-    delivery_personnel = db.query(models.DeliveryPersonnel).filter(models.DeliveryPersonnel.id == delivery_personnel_id).first()
+def set_delivery_availability(delivery_personnel_id: int, availability: schemas.DeliveryAvailability, db: Session = Depends(get_db),
+                              user: schemas.TokenData = Depends(auth.require_delivery_personnel)):
+    auth.check_owner(user, delivery_personnel_id)
+    delivery_personnel = crud.set_availability(db, delivery_personnel_id, availability)
     if not delivery_personnel:
         raise HTTPException(status_code=404, detail="Delivery personnel not found")
-    # Here, we can toggle availability flag based on the provided data
-    # Assuming `availability` is a boolean, we will store it as such
-    delivery_personnel.available = availability.available
-    db.commit()
-    db.refresh(delivery_personnel)
-    return {"msg": "Availability updated", "available": delivery_personnel.available}
\ No newline at end of file
+    dispatcher.courier_changed(delivery_personnel.id, delivery_personnel.is_available,
+                               delivery_personnel.latitude, delivery_personnel.longitude)
+    if availability.latitude is not None and availability.longitude is not None:
+        location_buffer.remember(delivery_personnel.id, availability.latitude, availability.longitude)
+    return {"msg": "Availability updated", "available": delivery_personnel.is_available}
+
+# Position ping from a courier's app, sent every few seconds while on shift. Only recorded
+# in memory; locations.flush_periodically writes the latest position of each courier
+@router.post("/location/{delivery_personnel_id}", status_code=202)
+async def report_location(delivery_personnel_id: int, ping: schemas.LocationPing,
+                          user: schemas.TokenData = Depends(auth.require_delivery_personnel)):
+    auth.check_owner(user, delivery_personnel_id)
+    location_buffer.record(delivery_personnel_id, ping.latitude, ping.longitude)
+    return {"msg": "Location recorded"}
+
+def _location(delivery_personnel_id: int, position):
+    latitude, longitude, reported_at = position
+    return schemas.CourierLocation(delivery_personnel_id=delivery_personnel_id, latitude=latitude,
+                                   longitude=longitude, reported_at=datetime.utcfromtimestamp(reported_at))
+
+# Latest position of a courier: from memory when this worker received it, otherwise the
+# last one written to the database
+@router.get("/location/{delivery_personnel_id}", response_model=schemas.CourierLocation, dependencies=[Depends(auth.require_delivery_personnel)])
+async def get_location(delivery_personnel_id: int, db: Session = Depends(get_async_read_db)):
+    position = location_buffer.get(delivery_personnel_id)
+    if position is not None:
+        return _location(delivery_personnel_id, position)
+    stored = await run_sync(db, crud.get_courier_position, delivery_personnel_id)
+    if stored is None or stored.latitude is None or stored.longitude is None:
+        raise HTTPException(status_code=404, detail="No position for this delivery personnel")
+    return _stored_location(stored)
+
+def _stored_location(stored):
+    return schemas.CourierLocation(delivery_personnel_id=stored.id, latitude=stored.latitude,
+                                   longitude=stored.longitude, reported_at=stored.location_reported_at)
+
+# Latest positions, optionally only some couriers or recent ones: the stored positions, which
+# cover pings received by every worker up to their last flush, updated with the newer ones
+# held in memory by this worker
+@router.get("/locations", response_model=List[schemas.CourierLocation], dependencies=[Depends(auth.require_delivery_personnel)])
+async def get_locations(ids: Optional[List[int]] = Query(None), max_age_seconds: Optional[float] = Query(None, gt=0),
+                        db: Session = Depends(get_async_read_db)):
+    since = datetime.utcnow() - timedelta(seconds=max_age_seconds) if max_age_seconds else None
+    stored = await run_sync(db, crud.get_courier_positions, ids, since)
+    locations = {row.id: _stored_location(row) for row in stored}
+    for courier_id, position in location_buffer.positions(ids, max_age_seconds).items():
+        location = _location(courier_id, position)
+        current = locations.get(courier_id)
+        if current is None or current.reported_at is None or current.reported_at < location.reported_at:
+            locations[courier_id] = location
+    return list(locations.values())
\ No newline at end of file
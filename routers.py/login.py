@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+import auth, schemas
+from database import get_async_db
+
+router = APIRouter()
+
+# Unified login for every role, issues the bearer token expected by auth.oauth2_scheme
+@router.post("/login", response_model=schemas.Token)
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_async_db)):
+    user = await auth.authenticate_user(db, form.username, form.password)
+    return {"access_token": auth.create_user_token(user), "token_type": "bearer"}
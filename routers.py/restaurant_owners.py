@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from typing import List
-import crud, schemas, models
-from database import get_db
+from typing import Optional
+import auth, crud, schemas, models, menu_import
+from database import get_db, get_async_db, run_sync
+from dispatch import dispatcher
+from pagination import PageParams
+from serialization import FAST_JSON, order_rows, page_response
 
 router = APIRouter()
 
@@ -16,78 +19,127 @@ def register_restaurant_owner(
     return crud.create_restaurant_owner(db, restaurant_owner)
 # Login for restaurant owner
 @router.post("/login")
-def login_restaurant_owner(username: str, password: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if not user or user.password != password:
-        raise HTTPException(status_code=400, detail="Invalid credentials")
-    return {"msg": "Login successful"}
+async def login_restaurant_owner(username: str, password: str, db: Session = Depends(get_async_db)):
+    user = await auth.authenticate_user(db, username, password, role="restaurant_owner")
+    return {"msg": "Login successful", "access_token": auth.create_user_token(user), "token_type": "bearer"}
 
 # Manage Menus - Add, Update, or Remove Menu Items
 @router.post("/menu", response_model=schemas.MenuBase)
-def add_menu_item(menu: schemas.MenuCreate, db: Session = Depends(get_db)):
+def add_menu_item(menu: schemas.MenuCreate, db: Session = Depends(get_db),
+                  user: schemas.TokenData = Depends(auth.require_restaurant_owner)):
     # Add a menu item to the restaurant
     restaurant_owner = db.query(models.RestaurantOwner).filter(models.RestaurantOwner.user_id == menu.user_id).first()
     if not restaurant_owner:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    new_menu_item = crud.create_menu_item(db, menu, restaurant_owner.id)
+    auth.check_owner(user, restaurant_owner.id)
+    try:
+        new_menu_item = crud.create_menu_item(db, menu, restaurant_owner.id)
+    except crud.DuplicateMenuName as error:
+        raise HTTPException(status_code=409, detail=str(error))
     return new_menu_item
 
 @router.put("/menu/{menu_id}", response_model=schemas.MenuBase)
-def update_menu_item(menu_id: int, menu: schemas.MenuCreate, db: Session = Depends(get_db)):
+def update_menu_item(menu_id: int, menu: schemas.MenuCreate, db: Session = Depends(get_db),
+                     user: schemas.TokenData = Depends(auth.require_restaurant_owner)):
     # Update a specific menu item
     existing_menu_item = db.query(models.Menu).filter(models.Menu.id == menu_id).first()
     if not existing_menu_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    updated_menu_item = crud.update_menu_item(db, menu_id, menu)
+    auth.check_owner(user, existing_menu_item.restaurant_owner_id)
+    try:
+        updated_menu_item = crud.update_menu(db, menu_id, menu)
+    except crud.DuplicateMenuName as error:
+        raise HTTPException(status_code=409, detail=str(error))
     return updated_menu_item
 
 @router.delete("/menu/{menu_id}")
-def delete_menu_item(menu_id: int, db: Session = Depends(get_db)):
+def delete_menu_item(menu_id: int, db: Session = Depends(get_db),
+                     user: schemas.TokenData = Depends(auth.require_restaurant_owner)):
     # Delete a specific menu item
     menu_item = db.query(models.Menu).filter(models.Menu.id == menu_id).first()
     if not menu_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    crud.delete_menu_item(db, menu_id)
+    auth.check_owner(user, menu_item.restaurant_owner_id)
+    crud.delete_menu(db, menu_id)
     return {"msg": "Menu item deleted successfully"}
 
+# Bulk import menu items from a JSON array of menu items or a CSV file with a
+# name,description,price,availability header. Existing items with the same name are updated.
+@router.post("/restaurant/{restaurant_owner_id}/menu/import")
+async def import_menu(restaurant_owner_id: int, request: Request, db: Session = Depends(get_async_db),
+                      user: schemas.TokenData = Depends(auth.require_restaurant_owner)):
+    auth.check_owner(user, restaurant_owner_id)
+    if not await run_sync(db, crud.get_restaurant, restaurant_owner_id):
+        raise HTTPException(status_code=404, detail="Restaurant owner not found")
+    # The body is parsed as it streams in and written a batch at a time, never held whole
+    parse = menu_import.csv_rows if "csv" in request.headers.get("content-type", "") else menu_import.json_rows
+    importer = crud.MenuImport(restaurant_owner_id)
+    batch = []
+    try:
+        async for row in parse(request.stream()):
+            batch.append(row)
+            if len(batch) >= crud.IMPORT_BATCH_SIZE:
+                await run_sync(db, importer.add, batch)
+                batch = []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or CSV")
+    await run_sync(db, importer.add, batch)
+    return await run_sync(db, importer.finish)
+
 # View incoming orders for the restaurant owner
-@router.get("/orders", response_model=List[schemas.OrderBase])
-def view_orders(restaurant_owner_id: int, db: Session = Depends(get_db)):
-    orders = db.query(models.Order).filter(models.Order.restaurant_owner_id == restaurant_owner_id).all()
-    if not orders:
+@router.get("/orders", response_model=schemas.OrderPage)
+def view_orders(restaurant_owner_id: int, status: Optional[str] = None, page: PageParams = Depends(),
+                db: Session = Depends(get_db), user: schemas.TokenData = Depends(auth.require_restaurant_owner)):
+    auth.check_owner(user, restaurant_owner_id)
+    orders, next_cursor = crud.get_restaurant_orders(db, restaurant_owner_id, page, status)
+    if not orders and page.after_id is None:
         raise HTTPException(status_code=404, detail="No orders found")
-    return orders
+    if FAST_JSON:
+        return page_response(order_rows, orders, next_cursor)
+    return {"items": orders, "next_cursor": next_cursor}
 
 # Update order status (e.g., order accepted, preparing, ready for delivery)
 @router.put("/orders/{order_id}")
-def update_order_status(order_id: int, status: str, db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
-    if not order:
+def update_order_status(order_id: int, status: str, db: Session = Depends(get_db),
+                        user: schemas.TokenData = Depends(auth.require_restaurant_owner)):
+    try:
+        updated = crud.manage_order(db, order_id, status, auth.owned_id(user))
+    except crud.NotOwner:
+        raise auth.not_owner()
+    if not updated:
         raise HTTPException(status_code=404, detail="Order not found")
-    order.status = status
-    db.commit()
-    db.refresh(order)
-    return {"msg": "Order status updated", "status": order.status}
+    return {"msg": "Order status updated", "status": status}
 
 # Update restaurant details (e.g., hours of operation, address)
 @router.put("/restaurant/{restaurant_owner_id}")
-def update_restaurant_details(restaurant_owner_id: int, details: schemas.RestaurantOwnerCreate, db: Session = Depends(get_db)):
+def update_restaurant_details(restaurant_owner_id: int, details: schemas.RestaurantOwnerCreate, db: Session = Depends(get_db),
+                              user: schemas.TokenData = Depends(auth.require_restaurant_owner)):
+    auth.check_owner(user, restaurant_owner_id)
     restaurant_owner = db.query(models.RestaurantOwner).filter(models.RestaurantOwner.id == restaurant_owner_id).first()
     if not restaurant_owner:
         raise HTTPException(status_code=404, detail="Restaurant owner not found")
     restaurant_owner.restaurant_name = details.restaurant_name
     restaurant_owner.address = details.address
     restaurant_owner.hours_of_operation = details.hours_of_operation
+    hours_recognized = crud.set_hours(db, restaurant_owner.id, details.hours_of_operation)
+    if details.latitude is not None and details.longitude is not None:
+        restaurant_owner.latitude = details.latitude
+        restaurant_owner.longitude = details.longitude
     db.commit()
     db.refresh(restaurant_owner)
-    return {"msg": "Restaurant details updated", "restaurant_name": restaurant_owner.restaurant_name}
+    dispatcher.restaurant_changed(restaurant_owner.id, restaurant_owner.latitude, restaurant_owner.longitude)
+    return {"msg": "Restaurant details updated", "restaurant_name": restaurant_owner.restaurant_name,
+            "hours_recognized": hours_recognized}
 
 
 # Endpoint to add a new menu item
-@router.post("/add_menu_item", response_model=schemas.MenuCreate)
+@router.post("/add_menu_item", response_model=schemas.MenuCreate, dependencies=[Depends(auth.require_restaurant_owner)])
 def add_menu_item(
     menu: schemas.MenuCreate, 
     db: Session = Depends(get_db)
 ):
     # Call a CRUD function to add the menu item to the database
-    return crud.create_menu_item(db, menu)
\ No newline at end of file
+    try:
+        return crud.create_menu_item(db, menu)
+    except crud.DuplicateMenuName as error:
+        raise HTTPException(status_code=409, detail=str(error))
\ No newline at end of file
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field
 from typing import List, Optional
 # Update schema for User
 class UserUpdate(BaseModel):
@@ -62,6 +63,18 @@ class RestaurantOwnerProfile(RestaurantOwnerBase):
     class Config:
         orm_mode = True
 
+# Restaurant as listed to customers, no account fields
+class RestaurantSummary(BaseModel):
+    id: int
+    restaurant_name: Optional[str] = None
+    address: Optional[str] = None
+    hours_of_operation: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    class Config:
+        orm_mode = True
+
 class RestaurantMenu(BaseModel):
     id: int
     name: str
@@ -116,8 +129,9 @@ class DeliveryBase(BaseModel):
 # Delivery Response Schema - Includes additional fields
 class DeliveryResponse(DeliveryBase):
     id: int
-    delivery_personnel_name: str
-    order_status: str
+    delivery_personnel_id: Optional[int] = None  # none while the delivery is available
+    delivery_personnel_name: Optional[str] = None
+    order_status: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -173,16 +187,33 @@ class OrderBase(BaseModel):
     status: str  # 'preparing', 'out for delivery', 'delivered'
     total_amount: int
 
-class OrderCreate(OrderBase):
-    items: List[int]  # List of menu items
+    class Config:
+        orm_mode = True
+
+class OrderItemCreate(BaseModel):
+    menu_id: int
+    quantity: int = Field(1, ge=1)
+
+# Prices, total and status are set server-side when the order is placed
+class OrderCreate(BaseModel):
+    customer_id: int
+    restaurant_owner_id: int
+    items: List[OrderItemCreate]  # Menu items and quantities
+
+# Outcome of placing one order, error is set instead of order_id when it was rejected
+class OrderPlacement(BaseModel):
+    order_id: Optional[int] = None
+    status: Optional[str] = None
+    total_amount: Optional[int] = None
+    error: Optional[str] = None
 
 class OrderUpdate(BaseModel):
     status: str  # Update order status
 
 class OrderResponse(OrderBase):
     id: int
-    customer: str
-    restaurant_owner: str
+    customer: Optional[str] = None  # customer name
+    restaurant_owner: Optional[str] = None  # restaurant name
 
     class Config:
         orm_mode = True
@@ -227,17 +258,66 @@ class MenuResponse(MenuBase):
 
     class Config:
         orm_mode = True
+# Menu search result, ranked by relevance
+class MenuSearchHit(MenuResponse):
+    restaurant_owner_id: int
+    score: float
+
+class MenuSearchResults(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    items: List[MenuSearchHit]
+# Keyset-paginated list responses, pass next_cursor back as ?cursor= for the next page
+class RestaurantPage(BaseModel):
+    items: List[RestaurantSummary]
+    next_cursor: Optional[str] = None
+
+class OrderPage(BaseModel):
+    items: List[OrderResponse]
+    next_cursor: Optional[str] = None
+
+class DeliveryPage(BaseModel):
+    items: List[DeliveryResponse]
+    next_cursor: Optional[str] = None
+# Courier assigned to a ready order by the dispatcher
+class DispatchAssignment(BaseModel):
+    order_id: int
+    delivery_id: int
+    delivery_personnel_id: int
+    distance_km: float
+# EXPLAIN output for one hot query, full_scans lists the tables it reads without an index
+class QueryPlan(BaseModel):
+    name: str
+    statement: str
+    full_scans: List[str]
+    plan: List[dict]
 # 6. JWT Token Schema
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 class TokenData(BaseModel):
-    username: str
-    role: str  # 'customer', 'restaurant_owner', 'delivery_personnel'
+    id: int
+    role: str  # 'customer', 'restaurant_owner', 'delivery_personnel', 'admin'
+    active: bool = True
+    profile_id: Optional[int] = None  # Customer, restaurant or courier id of the user, None for admins
+# Position reported by a courier's app
+class LocationPing(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+class CourierLocation(BaseModel):
+    delivery_personnel_id: int
+    latitude: float
+    longitude: float
+    reported_at: Optional[datetime] = None  # UTC; None for a position stored without its time
+
 # Schema for updating the availability of delivery personnel
 class DeliveryAvailability(BaseModel):
     available: bool  # Whether the delivery personnel is available for deliveries
+    latitude: Optional[float] = None  # Current position, used to dispatch the nearest courier
+    longitude: Optional[float] = None
 
     class Config:
         orm_mode = True
@@ -248,6 +328,8 @@ class RestaurantOwnerCreate(BaseModel):
     restaurant_name: str  # Name of the restaurant
     address: str  # Address of the restaurant
     hours_of_operation: str  # Operating hours of the restaurant
+    latitude: Optional[float] = None  # Pickup location of the restaurant
+    longitude: Optional[float] = None
 
     class Config:
         orm_mode = True
@@ -257,6 +339,7 @@ class MenuCreate(BaseModel):
     description: str  # Description of the menu
     price: float  # Price of the menu item
     availability: bool  # Whether the menu item is available
+    user_id: Optional[int] = None  # User account of the restaurant owner adding the item
 
     class Config:
         orm_mode = True
@@ -264,6 +347,7 @@ class MenuCreate(BaseModel):
 class Report(BaseModel):
     report_type: str  # Type of the report (e.g., "orders", "users")
     data: List[dict]  # Data in the report, can be a list of dictionaries or any structured format you choose
+    next_cursor: Optional[str] = None  # Set for paginated reports when more rows remain
 
     class Config:
         orm_mode = True
@@ -274,6 +358,7 @@ class ActivityReport(BaseModel):
     active_users: int  # Number of active users
     total_deliveries: int  # Total number of deliveries
     orders_pending: int  # Number of orders pending
+    orders_in_progress: int  # Number of orders accepted but not yet delivered
     orders_completed: int  # Number of completed orders
     platform_uptime: str  # Uptime status or a timestamp
 
@@ -0,0 +1,217 @@
+import heapq
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+import models
+from database import config, read_session
+
+search_config = config.get('search', {})
+
+WORD_RE = re.compile(r"\w+")
+
+MENU_FIELDS = ("id", "restaurant_owner_id", "name", "description", "price", "availability")
+
+# Name hits rank above description hits
+FIELD_WEIGHTS = {"name": 2.0, "description": 1.0}
+
+def _words(text):
+    return WORD_RE.findall((text or "").lower())
+
+# Trigrams of a word, padded so the start of the word weighs more. With prefix=True the
+# word is left open on the right, which lets "bur" match "burger".
+def _trigrams(word: str, prefix: bool = False):
+    padded = "  " + word + ("" if prefix else " ")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# In-process menu search index. Menu items are indexed by the words of their name and
+# description; typo and prefix tolerance come from a trigram index over the (small)
+# vocabulary of distinct words, so a query only fans out to item postings for words that
+# actually look like it. Kept current by the menu write paths in crud and rebuilt from
+# the database every search.rebuild_seconds so writes handled by other workers show up.
+class MenuSearchIndex:
+    def __init__(self, rebuild_seconds: float = 600, min_similarity: float = 0.4):
+        self.rebuild_seconds = rebuild_seconds
+        self.min_similarity = min_similarity
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._reset()
+        self._loaded_at = None
+        self._pending = None  # writes seen while a rebuild is running
+
+    def _reset(self):
+        self._items = {}  # menu id -> menu fields
+        self._item_words = {}  # menu id -> {field: words}
+        self._postings = {field: defaultdict(set) for field in FIELD_WEIGHTS}  # word -> menu ids
+        self._vocabulary = defaultdict(set)  # trigram -> words
+        self._word_refs = Counter()  # word -> number of postings it appears in
+        self._unavailable = set()
+        self._by_restaurant = defaultdict(set)
+
+    def _add(self, item: dict):
+        menu_id = item["id"]
+        self._remove(menu_id)
+        words = {field: set(_words(item[field])) for field in FIELD_WEIGHTS}
+        for field, field_words in words.items():
+            for word in field_words:
+                self._postings[field][word].add(menu_id)
+                if self._word_refs[word] == 0:
+                    for gram in _trigrams(word):
+                        self._vocabulary[gram].add(word)
+                self._word_refs[word] += 1
+        self._items[menu_id] = item
+        self._item_words[menu_id] = words
+        self._by_restaurant[item["restaurant_owner_id"]].add(menu_id)
+        if not item["availability"]:
+            self._unavailable.add(menu_id)
+
+    def _remove(self, menu_id: int):
+        words = self._item_words.pop(menu_id, None)
+        if words is None:
+            return
+        for field, field_words in words.items():
+            for word in field_words:
+                ids = self._postings[field][word]
+                ids.discard(menu_id)
+                if not ids:
+                    del self._postings[field][word]
+                self._word_refs[word] -= 1
+                if self._word_refs[word] == 0:
+                    del self._word_refs[word]
+                    for gram in _trigrams(word):
+                        self._vocabulary[gram].discard(word)
+                        if not self._vocabulary[gram]:
+                            del self._vocabulary[gram]
+        item = self._items.pop(menu_id)
+        restaurant_ids = self._by_restaurant[item["restaurant_owner_id"]]
+        restaurant_ids.discard(menu_id)
+        if not restaurant_ids:
+            del self._by_restaurant[item["restaurant_owner_id"]]
+        self._unavailable.discard(menu_id)
+
+    def add(self, db_menu: models.Menu):
+        item = {field: getattr(db_menu, field) for field in MENU_FIELDS}
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("_add", item))
+            self._add(item)
+
+    def remove(self, menu_id: int):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("_remove", menu_id))
+            self._remove(menu_id)
+
+    def load(self, db):
+        with self._lock:
+            self._pending = []
+        try:
+            rows = db.query(*(getattr(models.Menu, field) for field in MENU_FIELDS)).yield_per(10000)
+            fresh = MenuSearchIndex()
+            for row in rows:
+                fresh._add(dict(zip(MENU_FIELDS, row)))
+            with self._lock:
+                # Replay writes committed while the snapshot was being read
+                for method, arg in self._pending:
+                    getattr(fresh, method)(arg)
+                for name in ("_items", "_item_words", "_postings", "_vocabulary", "_word_refs",
+                             "_unavailable", "_by_restaurant"):
+                    setattr(self, name, getattr(fresh, name))
+                self._loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or bool(self.rebuild_seconds and time.monotonic() - loaded_at > self.rebuild_seconds)
+
+    def _rebuild(self):
+        db = read_session()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+            self._load_lock.release()
+
+    # The first call builds the index; later rebuilds run in the background while the
+    # current index keeps serving
+    def ensure_loaded(self, db):
+        if self._loaded_at is None:
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self.load(db)
+        elif self._stale() and self._load_lock.acquire(blocking=False):
+            threading.Thread(target=self._rebuild, daemon=True).start()
+
+    # Vocabulary words similar to a query word, as {word: similarity in 0..1}
+    def _similar_words(self, query_word: str, prefix: bool):
+        query_grams = _trigrams(query_word, prefix=prefix)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._vocabulary.get(gram, ()))
+        similar = {}
+        for word, count in shared.items():
+            if word == query_word:
+                similarity = 1.0
+            elif prefix and word.startswith(query_word):
+                similarity = 0.9
+            else:
+                similarity = count / max(len(query_grams), len(word) + 1)
+            if similarity >= self.min_similarity:
+                similar[word] = similarity
+        return similar
+
+    # (score, ids) groups matching one query word, best first
+    def _groups(self, query_word: str, prefix: bool):
+        groups = []
+        for word, similarity in self._similar_words(query_word, prefix).items():
+            for field, weight in FIELD_WEIGHTS.items():
+                ids = self._postings[field].get(word)
+                if ids:
+                    groups.append((weight * similarity, ids))
+        groups.sort(key=lambda group: group[0], reverse=True)
+        return groups
+
+    # Returns (total matches, ranked page of menu items). Every query word must match.
+    def search(self, query: str, available_only: bool = True, restaurant_id: int = None,
+               offset: int = 0, limit: int = 20):
+        query_words = _words(query)
+        if not query_words:
+            return 0, []
+        needed = offset + limit
+        with self._lock:
+            word_groups = [self._groups(word, prefix=(i == len(query_words) - 1))
+                           for i, word in enumerate(query_words)]
+            candidates = None
+            for groups in word_groups:
+                matched = set().union(*(ids for _, ids in groups))
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return 0, []
+            if available_only:
+                candidates -= self._unavailable
+            if restaurant_id is not None:
+                candidates &= self._by_restaurant.get(restaurant_id, set())
+            max_score = FIELD_WEIGHTS["name"] * len(query_words)
+            ranked = []
+            if len(word_groups) == 1:
+                # Single word: groups are already in score order, walk them until the page is full
+                seen = set()
+                for score, ids in word_groups[0]:
+                    fresh = (ids & candidates) - seen
+                    ranked.extend((score, menu_id) for menu_id in heapq.nsmallest(needed - len(ranked), fresh))
+                    seen |= fresh
+                    if len(ranked) >= needed:
+                        break
+            else:
+                scored = []
+                for menu_id in candidates:
+                    score = sum(next(score for score, ids in groups if menu_id in ids) for groups in word_groups)
+                    scored.append((-score, menu_id))
+                ranked = [(-score, menu_id) for score, menu_id in heapq.nsmallest(needed, scored)]
+            results = [dict(self._items[menu_id], score=round(score / max_score, 4))
+                       for score, menu_id in ranked[offset:needed]]
+        return len(candidates), results
+
+menu_index = MenuSearchIndex(rebuild_seconds=search_config.get('rebuild_seconds', 600))
@@ -0,0 +1,90 @@
+import json
+import operator
+import typing
+from fastapi import Response
+import schemas
+from database import config
+
+# orjson is optional; without it the fast path still skips the per-row models and
+# encodes with the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+serialization_config = config.get('serialization', {})
+
+# Opt-in: list endpoints answer with rows encoded straight to JSON bytes instead of going
+# through their response_model one object at a time
+FAST_JSON = bool(serialization_config.get('fast_json', False))
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+class JSONBytesResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return content if isinstance(content, bytes) else dumps(content)
+
+def _fields(schema):
+    fields = getattr(schema, "model_fields", None)
+    if fields is not None:
+        return {name: field.annotation for name, field in fields.items()}
+    return {name: field.outer_type_ for name, field in schema.__fields__.items()}  # pydantic 1
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+# Values the database returns as another type than the schema declares (an Integer price
+# declared float), converted as the schema would
+_CONVERTERS = {float: _to_float}
+
+# Turns result rows (tuples with named fields, as returned by column queries) into the
+# dicts a response_model schema would produce, without building a model per row. Built
+# once per schema; the first row of each result maps the schema fields to row positions.
+class RowEncoder:
+    def __init__(self, schema):
+        self.names = tuple(_fields(schema))
+        self.converters = {}
+        for name, annotation in _fields(schema).items():
+            types = [arg for arg in typing.get_args(annotation) if arg is not type(None)] or [annotation]
+            if len(types) == 1 and types[0] in _CONVERTERS:
+                self.converters[name] = _CONVERTERS[types[0]]
+        self._getters = {}  # row fields -> getter putting them in schema order
+
+    def _getter(self, row_fields):
+        if row_fields not in self._getters:
+            positions = [row_fields.index(name) for name in self.names]
+            if positions == list(range(len(row_fields))):
+                getter = None  # the row already holds exactly the schema's fields, in order
+            elif len(positions) == 1:
+                getter = lambda row, position=positions[0]: (row[position],)
+            else:
+                getter = operator.itemgetter(*positions)
+            self._getters[row_fields] = getter
+        return self._getters[row_fields]
+
+    def encode(self, rows):
+        if not rows:
+            return []
+        names = self.names
+        getter = self._getter(tuple(rows[0]._fields))
+        if getter is None:
+            items = [dict(zip(names, row)) for row in rows]
+        else:
+            items = [dict(zip(names, getter(row))) for row in rows]
+        for name, convert in self.converters.items():
+            for item in items:
+                item[name] = convert(item[name])
+        return items
+
+# {"items": [...], "next_cursor": ...} for a page from pagination.paginate
+def page_response(encoder: RowEncoder, rows, next_cursor):
+    return JSONBytesResponse(dumps({"items": encoder.encode(rows), "next_cursor": next_cursor}))
+
+order_rows = RowEncoder(schemas.OrderResponse)
+menu_rows = RowEncoder(schemas.MenuBase)
+restaurant_rows = RowEncoder(schemas.RestaurantSummary)
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import models
+
+
+# A fresh SQLite database file per test, with every table of models.py
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db", connect_args={"timeout": 60})
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(Session):
+    session = Session()
+    yield session
+    session.close()
+
+
+# Records the SQL statements run on the test engine while the block runs:
+#
+#     with count_queries() as statements:
+#         crud.get_orders(db, page)
+#     assert len(statements) == 1
+@pytest.fixture
+def count_queries(engine):
+    @contextmanager
+    def counting():
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    return counting
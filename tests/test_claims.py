@@ -0,0 +1,48 @@
+import threading
+import crud
+import models
+from dispatch import ASSIGNED_STATUS
+
+
+def delivery(Session, **values):
+    db = Session()
+    db.add(models.Delivery(**values))
+    db.commit()
+    delivery_id = db.query(models.Delivery.id).scalar()
+    db.close()
+    return delivery_id
+
+
+def test_exactly_one_concurrent_claim_wins(Session):
+    delivery_id = delivery(Session, status="available")
+    claimers = 20
+    barrier = threading.Barrier(claimers)
+    outcomes = {}
+
+    def claim(courier_id):
+        session = Session()
+        try:
+            barrier.wait()
+            outcomes[courier_id] = crud.claim_delivery(session, delivery_id, courier_id)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=claim, args=(courier_id,)) for courier_id in range(1, claimers + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [courier_id for courier_id, won in outcomes.items() if won]
+    assert len(outcomes) == claimers and len(winners) == 1
+    db = Session()
+    stored = db.get(models.Delivery, delivery_id)
+    assert (stored.delivery_personnel_id, stored.status) == (winners[0], "picked up")
+    db.close()
+
+
+def test_an_assigned_delivery_is_claimed_only_by_its_courier(Session, db):
+    delivery_id = delivery(Session, status=ASSIGNED_STATUS, delivery_personnel_id=1)
+    assert not crud.claim_delivery(db, delivery_id, 2)
+    assert crud.claim_delivery(db, delivery_id, 1)
+    assert not crud.claim_delivery(db, delivery_id, 1)
@@ -0,0 +1,40 @@
+import models
+from dispatch import Dispatcher, READY_STATUS
+
+
+def courier(db, courier_id, latitude):
+    db.add(models.DeliveryPersonnel(id=courier_id, name=f"c{courier_id}", is_available=True,
+                                    latitude=latitude, longitude=77.6))
+    db.commit()
+
+
+def test_a_courier_taken_by_another_dispatcher_is_not_assigned_again(db):
+    db.add(models.RestaurantOwner(id=1, restaurant_name="r", latitude=12.9, longitude=77.6))
+    db.add_all([models.Order(id=order_id, restaurant_owner_id=1, status=READY_STATUS, total_amount=1)
+                for order_id in (1, 2)])
+    courier(db, 1, 12.9)
+    first, second = Dispatcher(reload_seconds=3600), Dispatcher(reload_seconds=3600)
+    first.load(db)
+    second.load(db)
+
+    assert [(a["order_id"], a["delivery_personnel_id"]) for a in first.dispatch(db)] == [(1, 1)]
+    # The second dispatcher still has courier 1 in its index: the match is dropped and the
+    # order goes to the next nearest courier
+    courier(db, 2, 12.95)
+    second.courier_changed(2, True, 12.95, 77.6)
+    assert [(a["order_id"], a["delivery_personnel_id"]) for a in second.dispatch(db)] == [(2, 2)]
+    assert db.query(models.Delivery).filter_by(delivery_personnel_id=1).count() == 1
+
+
+def test_no_assignment_when_every_matched_courier_was_taken(db):
+    db.add(models.RestaurantOwner(id=1, restaurant_name="r", latitude=12.9, longitude=77.6))
+    db.add(models.Order(id=1, restaurant_owner_id=1, status=READY_STATUS, total_amount=1))
+    courier(db, 1, 12.9)
+    dispatcher = Dispatcher(reload_seconds=3600)
+    dispatcher.load(db)
+    db.query(models.DeliveryPersonnel).update({"is_available": False})
+    db.commit()
+
+    assert dispatcher.dispatch(db) == []
+    assert db.query(models.Delivery).count() == 0
+    assert db.get(models.Order, 1).status == READY_STATUS
@@ -0,0 +1,51 @@
+import random
+from geo import GridIndex, distance_km, match_nearest
+
+
+def brute_force(points, lat, lon, max_km):
+    found = [(distance_km(lat, lon, point_lat, point_lon), key) for key, (point_lat, point_lon) in points.items()]
+    found = [(km, key) for km, key in found if km <= max_km]
+    return min(found) if found else None
+
+
+def test_nearest_matches_a_full_scan():
+    rng = random.Random(1)
+    index, points = GridIndex(cell_size=0.01), {}
+    for key in range(500):
+        points[key] = (12.9 + rng.random() * 0.2, 77.5 + rng.random() * 0.2)
+        index.upsert(key, *points[key])
+    for _ in range(200):
+        lat, lon = 12.85 + rng.random() * 0.3, 77.45 + rng.random() * 0.3
+        expected = brute_force(points, lat, lon, 3.0)
+        found = index.nearest(lat, lon, max_km=3.0)
+        if expected is None:
+            assert found is None
+        else:
+            assert found[0] == expected[1] and abs(found[1] - expected[0]) < 1e-9
+
+
+def test_nothing_beyond_max_km():
+    index = GridIndex()
+    index.upsert("far", 13.0, 77.6)
+    assert index.nearest(12.9, 77.6, max_km=5) is None
+    assert index.nearest(12.9, 77.6, max_km=20)[0] == "far"
+
+
+def test_upsert_moves_and_remove_forgets():
+    index = GridIndex()
+    index.upsert(1, 12.9, 77.6)
+    index.upsert(2, 12.95, 77.6)
+    index.upsert(1, 13.0, 77.6)
+    assert len(index) == 2 and index.nearest(12.9, 77.6)[0] == 2
+    index.remove(2)
+    index.remove(2)
+    assert 2 not in index and index.nearest(12.9, 77.6, max_km=20)[0] == 1
+
+
+def test_match_nearest_gives_each_point_once():
+    index = GridIndex()
+    index.upsert("a", 12.9, 77.6)
+    index.upsert("b", 12.92, 77.6)
+    matches = match_nearest(index, [(1, 12.9, 77.6), (2, 12.9, 77.6), (3, 12.9, 77.6)])
+    assert [(pickup, point) for pickup, point, _ in matches] == [(1, "a"), (2, "b")]
+    assert len(index) == 0
@@ -0,0 +1,63 @@
+import pytest
+import hours
+
+DAY = hours.MINUTES_PER_DAY
+
+
+def weekly(days, opens, closes):
+    return [(day * DAY + opens, day * DAY + closes) for day in days]
+
+
+def test_each_day_group_gets_the_times_after_it():
+    assert hours.parse("Mon-Fri 9-17, Sat-Sun 12-23") == \
+        weekly(range(5), 9 * 60, 17 * 60) + weekly((5, 6), 12 * 60, 23 * 60)
+    assert hours.parse("Mon-Fri 9am-5pm, Sat 10am-2pm") == \
+        weekly(range(5), 9 * 60, 17 * 60) + weekly((5,), 10 * 60, 14 * 60)
+
+
+def test_times_before_the_days():
+    assert hours.parse("9am to 9pm weekdays") == weekly(range(5), 9 * 60, 21 * 60)
+    assert hours.parse("9-17 Mon-Fri, 10-14 Sat") == \
+        weekly(range(5), 9 * 60, 17 * 60) + weekly((5,), 10 * 60, 14 * 60)
+
+
+def test_several_ranges_for_the_same_days():
+    assert hours.parse("Mon-Fri 11:00-15:00, 18:00-23:00") == sorted(
+        weekly(range(5), 11 * 60, 15 * 60) + weekly(range(5), 18 * 60, 23 * 60))
+
+
+def test_closed_removes_the_days():
+    assert hours.parse("Mon-Sun 10:00-22:00; Mon closed") == weekly(range(1, 7), 10 * 60, 22 * 60)
+    assert hours.parse("Mon-Sun 10-22, Mon closed") == weekly(range(1, 7), 10 * 60, 22 * 60)
+    assert hours.parse("closed") == []
+
+
+def test_closed_keeps_the_previous_night():
+    assert hours.parse("Sun 22:00-02:00; Mon closed") == [(0, 2 * 60), (6 * DAY + 22 * 60, 7 * DAY)]
+
+
+def test_bare_closing_hour_is_pm():
+    assert hours.parse("Weekdays 9-5") == weekly(range(5), 9 * 60, 17 * 60)
+
+
+def test_past_midnight():
+    assert hours.parse("Daily 18:00-02:00") == [(0, 2 * 60)] + weekly(range(6), 18 * 60, DAY + 2 * 60) + \
+        [(6 * DAY + 18 * 60, 7 * DAY)]
+
+
+def test_round_the_clock():
+    assert hours.parse("24/7") == [(0, hours.MINUTES_PER_WEEK)]
+    assert hours.parse("00:00-24:00") == [(0, hours.MINUTES_PER_WEEK)]
+    assert hours.parse("Mon-Fri 24 hours") == [(0, 5 * DAY)]
+
+
+@pytest.mark.parametrize("text", [
+    "8-8", "12-12", "11:00-11:00", "", "Mon-Fri", "Mon closed 9-5", "Mon 9-5 x", "Mon 25:00-26:00", "Funday 9-5",
+])
+def test_unreadable_text_is_refused(text):
+    with pytest.raises(ValueError):
+        hours.parse(text)
+
+
+def test_split_days_cuts_at_midnight():
+    assert hours.split_days([(22 * 60, DAY + 2 * 60)]) == [(22 * 60, DAY), (DAY, DAY + 2 * 60)]
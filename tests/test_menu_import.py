@@ -0,0 +1,56 @@
+import asyncio
+import json
+import pytest
+from menu_import import csv_rows, json_rows
+
+
+# The body split into chunks of `size` bytes, as the request stream hands it over
+async def chunks(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def rows(parser, body: bytes, size: int):
+    async def collect():
+        return [row async for row in parser(chunks(body, size))]
+    return asyncio.run(collect())
+
+
+CSV = '\ufeffname,description,price,availability\r\nSoup,"hot, with ""basil""",4.5,true\nCrème brûlée,"two\nlines",6,false\n'
+CSV_ROWS = [
+    {"name": "Soup", "description": 'hot, with "basil"', "price": "4.5", "availability": "true"},
+    {"name": "Crème brûlée", "description": "two\nlines", "price": "6", "availability": "false"},
+]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_csv_rows_across_chunk_boundaries(size):
+    assert rows(csv_rows, CSV.encode(), size) == CSV_ROWS
+
+
+def test_csv_last_row_without_line_break():
+    assert rows(csv_rows, CSV.rstrip("\n").encode(), 5) == CSV_ROWS
+
+
+def test_csv_unterminated_quote():
+    with pytest.raises(ValueError):
+        rows(csv_rows, b'name,description\nSoup,"open', 4)
+
+
+ITEMS = [{"name": "Soup", "price": 4.5}, {"name": "Crème brûlée", "price": 6, "tags": ["sweet", "cold"]}]
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_json_rows_across_chunk_boundaries(size):
+    body = ("\ufeff " + json.dumps(ITEMS, ensure_ascii=False, indent=2) + "\n").encode()
+    assert rows(json_rows, body, size) == ITEMS
+
+
+def test_json_numbers_split_between_chunks():
+    assert rows(json_rows, b"[12345, 678]", 3) == [12345, 678]
+
+
+@pytest.mark.parametrize("body", [b'{"name": "Soup"}', b'[{"name": "Soup"}', b'[1] [2]', b', [1]', b""])
+def test_json_bodies_that_are_not_one_array(body):
+    with pytest.raises(ValueError):
+        rows(json_rows, body, 4)
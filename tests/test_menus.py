@@ -0,0 +1,37 @@
+import pytest
+import crud
+import models
+import schemas
+
+
+def menu(name):
+    return schemas.MenuCreate(name=name, description="d", price=5, availability=True, user_id=1)
+
+
+@pytest.fixture
+def restaurant(db):
+    db.add(models.RestaurantOwner(id=1, restaurant_name="r"))
+    db.commit()
+    return 1
+
+
+def test_duplicate_name_is_refused(db, restaurant):
+    crud.create_menu_item(db, menu("soup"), restaurant)
+    with pytest.raises(crud.DuplicateMenuName):
+        crud.create_menu_item(db, menu("soup"), restaurant)
+    assert db.query(models.Menu).filter_by(restaurant_owner_id=restaurant).count() == 1
+
+
+def test_rename_onto_an_existing_name_is_refused(db, restaurant):
+    crud.create_menu_item(db, menu("soup"), restaurant)
+    bread = crud.create_menu_item(db, menu("bread"), restaurant)
+    with pytest.raises(crud.DuplicateMenuName):
+        crud.update_menu(db, bread.id, menu("soup"))
+    assert db.get(models.Menu, bread.id).name == "bread"
+
+
+def test_same_name_in_another_restaurant(db, restaurant):
+    db.add(models.RestaurantOwner(id=2, restaurant_name="s"))
+    db.commit()
+    crud.create_menu_item(db, menu("soup"), restaurant)
+    assert crud.create_menu_item(db, menu("soup"), 2).name == "soup"
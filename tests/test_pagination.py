@@ -0,0 +1,32 @@
+import pytest
+from fastapi import HTTPException
+import crud
+import models
+from pagination import PageParams, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    for last_id in (0, 1, 123456789):
+        cursor = encode_cursor(last_id)
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == last_id
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", encode_cursor(1)[:-2], "eyJpZCI6ICJ4In0"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def test_available_deliveries_are_paged(db):
+    db.add_all([models.Delivery(order_id=order_id, status="available") for order_id in range(1, 6)])
+    db.add(models.Delivery(order_id=6, status="picked up"))
+    db.commit()
+    seen, cursor = [], None
+    while True:
+        rows, cursor = crud.get_deliveries(db, None, PageParams(cursor=cursor, limit=2))
+        seen.extend(row.order_id for row in rows)
+        if cursor is None:
+            break
+    assert seen == [1, 2, 3, 4, 5]
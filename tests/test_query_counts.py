@@ -0,0 +1,49 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+import crud
+import models
+import schemas
+from pagination import PageParams
+
+# list -> (response schema, crud call returning (rows, next_cursor))
+LISTS = {
+    "admins/orders": (schemas.OrderPage, lambda db, page: crud.get_orders(db, page)),
+    "restaurant_owners/orders": (schemas.OrderPage, lambda db, page: crud.get_restaurant_orders(db, 1, page)),
+    "customers/order-history": (schemas.OrderPage, lambda db, page: crud.get_customer_orders(db, 1, page)),
+    "delivery_personnel/deliveries": (schemas.DeliveryPage, lambda db, page: crud.get_deliveries(db, 1, page)),
+}
+
+
+# Validate a response against its schema reading attributes, as FastAPI does for response_model
+def validate(schema, value):
+    try:
+        from pydantic import TypeAdapter
+    except ImportError:  # pydantic 1, orm_mode schemas accept objects directly
+        from pydantic import parse_obj_as
+        return parse_obj_as(schema, value)
+    return TypeAdapter(schema).validate_python(value, from_attributes=True)
+
+
+@pytest.fixture
+def orders(db):
+    db.add_all([models.Customer(id=1, name="customer"), models.RestaurantOwner(id=1, restaurant_name="restaurant"),
+                models.DeliveryPersonnel(id=1, name="courier")])
+    for i in range(1, 101):
+        db.add(models.Order(id=i, customer_id=1, restaurant_owner_id=1, status="pending", total_amount=10))
+        db.add(models.Delivery(id=i, order_id=i, delivery_personnel_id=1, status="available"))
+    db.commit()
+
+
+# A lazy load per row while serializing would make the count grow with the page
+@pytest.mark.parametrize("name", LISTS)
+def test_statements_do_not_grow_with_the_page_size(name, db, orders, count_queries):
+    schema, fetch = LISTS[name]
+    counts = []
+    for rows in (10, 100):
+        with count_queries() as statements:
+            items, next_cursor = fetch(db, PageParams(cursor=None, limit=rows))
+            body = jsonable_encoder(validate(schema, {"items": items, "next_cursor": next_cursor}))
+        assert len(body["items"]) == rows
+        counts.append(len(statements))
+        db.rollback()
+    assert counts == [1, 1]
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+import pytest
+from search import MenuSearchIndex
+
+ITEMS = [
+    (1, 1, "Cheese Burger", "beef patty with cheddar", True),
+    (2, 1, "Veggie Wrap", "comes with a small burger sauce", True),
+    (3, 2, "Burger Deluxe", "double patty", True),
+    (4, 2, "Chicken Burger", "sold out", False),
+    (5, 2, "Tomato Soup", "with basil", True),
+]
+
+
+@pytest.fixture
+def index():
+    index = MenuSearchIndex()
+    for menu_id, restaurant_id, name, description, available in ITEMS:
+        index.add(SimpleNamespace(id=menu_id, restaurant_owner_id=restaurant_id, name=name,
+                                  description=description, price=5.0, availability=available))
+    return index
+
+
+def ids(results):
+    return [item["id"] for item in results[1]]
+
+
+def test_name_hits_rank_above_description_hits(index):
+    total, results = index.search("burger")
+    assert total == 3
+    assert [item["id"] for item in results] == [1, 3, 2]
+    assert results[0]["score"] > results[-1]["score"]
+
+
+def test_typos_and_prefixes_match(index):
+    assert ids(index.search("burgr")) == [1, 3, 2]
+    assert ids(index.search("tom")) == [5]
+    assert index.search("tom")[1][0]["score"] < index.search("tomato")[1][0]["score"]
+
+
+def test_every_query_word_must_match(index):
+    assert ids(index.search("cheese burger")) == [1]
+    assert index.search("cheese soup") == (0, [])
+    assert index.search("   ") == (0, [])
+
+
+def test_filters(index):
+    assert 4 not in ids(index.search("chicken"))
+    assert ids(index.search("chicken", available_only=False)) == [4]
+    assert ids(index.search("burger", restaurant_id=2)) == [3]
+
+
+def test_pages(index):
+    total, first = index.search("burger", limit=2)
+    _, second = index.search("burger", offset=2, limit=2)
+    assert total == 3 and [item["id"] for item in first + second] == [1, 3, 2]
+
+
+def test_removed_items_are_not_found(index):
+    index.remove(1)
+    assert ids(index.search("cheese")) == []
+    assert ids(index.search("burger")) == [3, 2]
@@ -0,0 +1,32 @@
+import time
+from auth import TokenCache
+
+
+def claims(expires_in: float = 60):
+    return {"sub": "user", "exp": time.time() + expires_in}
+
+
+def test_cached_claims_are_returned_until_they_expire():
+    cache = TokenCache()
+    fresh, expired = claims(), claims(-1)
+    cache.put("header.payload.fresh", fresh)
+    cache.put("header.payload.expired", expired)
+    assert cache.get("header.payload.fresh") is fresh
+    assert cache.get("header.payload.expired") is None
+    assert cache.get("header.payload.unknown") is None
+
+
+def test_a_token_is_matched_whole_not_only_by_its_signature():
+    cache = TokenCache()
+    cache.put("header.payload.signature", claims())
+    assert cache.get("header.forged.signature") is None
+
+
+def test_least_recently_used_tokens_are_evicted():
+    cache = TokenCache(max_entries=2)
+    cache.put("a.a.1", claims())
+    cache.put("a.a.2", claims())
+    assert cache.get("a.a.1") is not None  # 2 is now the least recently used
+    cache.put("a.a.3", claims())
+    assert cache.get("a.a.2") is None
+    assert cache.get("a.a.1") is not None and cache.get("a.a.3") is not None
@@ -0,0 +1,44 @@
+import pytest
+import counters
+import crud
+import models
+import schemas
+
+# write -> (crud call, statements with UPDATE ... RETURNING, statements with the rowcount
+# fallback used on MySQL). A write that loads the row first, refreshes it after the commit or
+# checks it twice goes over.
+WRITES = {
+    # UPDATE [+ SELECT], active user counter
+    "admins.deactivate_user": (lambda db: crud.deactivate_user(db, 2), 2, 3),
+    # SELECT ... FOR UPDATE of the old status, two counters, one rollup upsert, UPDATE
+    "restaurant_owners.update_order_status": (lambda db: crud.manage_order(db, 1, "preparing"), 5, 5),
+    # UPDATE [+ SELECT]
+    "delivery_personnel.update_delivery_status": (
+        lambda db: crud.update_delivery_status(db, 1, "delivered"), 1, 2),
+    "delivery_personnel.set_delivery_availability": (lambda db: crud.set_availability(
+        db, 1, schemas.DeliveryAvailability(available=True, latitude=12.9, longitude=77.6)), 1, 2),
+}
+
+
+@pytest.fixture
+def seeded(db):
+    db.add_all([
+        models.User(id=1, username="admin", password="-", role="admin", active=True),
+        models.User(id=2, username="customer", password="-", role="customer", active=True),
+        models.Customer(id=1, user_id=2, name="customer"), models.RestaurantOwner(id=1, restaurant_name="restaurant"),
+        models.DeliveryPersonnel(id=1, name="courier", is_available=False),
+        models.Order(id=1, customer_id=1, restaurant_owner_id=1, status="pending", total_amount=10),
+        models.Delivery(id=1, order_id=1, delivery_personnel_id=1, status="picked up"),
+    ])
+    db.commit()
+    counters.reconcile(db)
+
+
+@pytest.mark.parametrize("returning", [True, False], ids=["RETURNING", "rowcount"])
+@pytest.mark.parametrize("name", WRITES)
+def test_single_row_writes_stay_within_budget(name, returning, engine, db, seeded, count_queries):
+    write, with_returning, with_rowcount = WRITES[name]
+    engine.dialect.update_returning = returning
+    with count_queries() as statements:
+        assert write(db), f"{name}: row not found"
+    assert len(statements) <= (with_returning if returning else with_rowcount)